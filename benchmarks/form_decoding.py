@@ -0,0 +1,76 @@
+"""
+Compare decoding a large multi-section form with from_response against the previous one-level implementation.
+
+    python -m benchmarks.form_decoding --fields 2000 --repeat 200
+"""
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from flask import Flask, request
+from werkzeug.datastructures import MultiDict
+
+from react.response import from_response
+
+
+def previous_from_response(request):
+    # from_response before it handled nesting deeper than `parent.child`
+    result = {}
+    for raw_key in request.form.keys():
+        value = request.form.getlist(raw_key)
+        key = raw_key.replace('[]', '')
+        if len(value) == 1 and '[]' not in raw_key:
+            value = value[0].strip()
+        if '.' not in key:
+            result[key] = value
+        else:
+            parent_name = key.split('.')[0]
+            child_name = key.split('.')[1]
+            if parent_name not in result:
+                result[parent_name] = {}
+            result[parent_name][child_name] = value
+    if result.get('csrf_token'):
+        del result['csrf_token']
+    return result
+
+
+def make_form(fields):
+    """About `fields` fields, in sections of plain, nested, list and indexed fields"""
+    form = [('csrf_token', 'abc123')]
+    section = 0
+    while len(form) < fields:
+        prefix = 'section{}'.format(section)
+        form.extend([
+            ('{}.title'.format(prefix), 'Section {}'.format(section)),
+            ('{}.contact.email'.format(prefix), 'someone@example.com'),
+            ('{}.contact.phone'.format(prefix), '0400 000 000'),
+            ('{}.answers.criteria[]'.format(prefix), 'first'),
+            ('{}.answers.criteria[]'.format(prefix), 'second'),
+        ])
+        for item in range(5):
+            form.extend([
+                ('{}.items[{}].name'.format(prefix, item), 'Item {}'.format(item)),
+                ('{}.items[{}].price'.format(prefix, item), '{}.00'.format(item)),
+            ])
+        section += 1
+    return MultiDict(form[:fields])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fields', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    with app.test_request_context('/benchmark', method='POST', data=make_form(args.fields)):
+        request.form  # parse the request body up front, so only decoding is timed
+
+        for name, fn in [('previous', previous_from_response), ('from_response', from_response)]:
+            elapsed = min(timeit.repeat(lambda: fn(request), number=args.repeat, repeat=3))
+            print('{:14} {:8.3f} ms/form'.format(name, elapsed * 1000 / args.repeat))
+
+
+if __name__ == '__main__':
+    main()
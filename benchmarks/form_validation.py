@@ -0,0 +1,74 @@
+"""
+Compare validating a batch of payloads with validate_form_data and a FormSchema against the previous validate_form_data.
+
+    python -m benchmarks.form_validation --payloads 10000
+"""
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from react.response import FormSchema, validate_form_data
+
+
+def previous_validate_form_data(data, required_fields):
+    # validate_form_data before it was backed by a FormSchema
+    errors = {}
+    for field in required_fields:
+        name = field[0] if isinstance(field, tuple) else field
+        if not data.get(name, None) or not data.get(name)[0]:
+            errors[name] = {"required": True}
+            continue
+
+        length = field[1] if isinstance(field, tuple) else None
+        if length and len(data.get(name)) < length:
+            errors[name] = {"min": True}
+
+    return errors
+
+
+REQUIRED_FIELDS = ['title', 'organisation', ('summary', 10), 'location', ('description', 20), 'contact', 'budget']
+
+
+def make_payloads(count):
+    payloads = []
+    for i in range(count):
+        payload = {
+            'title': 'Brief {}'.format(i),
+            'organisation': 'Department of Examples',
+            'summary': 'A summary of the brief',
+            'location': ['Sydney', 'Canberra'],
+            'description': 'A longer description of the work to be done',
+            'contact': 'someone@example.com',
+            'budget': '100000',
+        }
+        # Every third payload has errors
+        if i % 3 == 0:
+            payload['summary'] = 'Short'
+            del payload['contact']
+        payloads.append(payload)
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--payloads', type=int, default=10000)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.payloads)
+    schema = FormSchema.from_required_fields(REQUIRED_FIELDS)
+    expected = [previous_validate_form_data(payload, REQUIRED_FIELDS) for payload in payloads]
+    assert schema.validate_many(payloads) == expected
+    assert [validate_form_data(payload, REQUIRED_FIELDS) for payload in payloads] == expected
+
+    for name, fn in [
+        ('previous', lambda: [previous_validate_form_data(payload, REQUIRED_FIELDS) for payload in payloads]),
+        ('validate_form_data', lambda: [validate_form_data(payload, REQUIRED_FIELDS) for payload in payloads]),
+        ('FormSchema', lambda: schema.validate_many(payloads)),
+    ]:
+        elapsed = min(timeit.repeat(fn, number=1, repeat=3))
+        print('{:20} {:10.0f} payloads/sec'.format(name, args.payloads / elapsed))
+
+
+if __name__ == '__main__':
+    main()
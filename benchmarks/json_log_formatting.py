@@ -0,0 +1,59 @@
+"""
+Compare formatting log records with JSONFormatter against the previous python-json-logger based implementation.
+
+    python -m benchmarks.json_log_formatting --records 100000
+"""
+from __future__ import print_function
+
+import argparse
+import logging
+import timeit
+
+from pythonjsonlogger.jsonlogger import JsonFormatter
+
+from dmutils.logging import JSONFormatter, LOG_FORMAT, TIME_FORMAT, orjson
+from benchmarks.log_formatting import make_records
+
+
+class PreviousJSONFormatter(JsonFormatter):
+    # JSONFormatter before it wrote its output directly
+    def process_log_record(self, log_record):
+        rename_map = {
+            "asctime": "time",
+            "request_id": "requestId",
+            "app_name": "application",
+        }
+        for key, newkey in rename_map.items():
+            log_record[newkey] = log_record.pop(key)
+        log_record['logType'] = "application"
+        try:
+            log_record['message'] = log_record['message'].format(**log_record)
+        except KeyError as e:
+            logging.getLogger('dmutils').exception("failed to format log message: {} not found".format(e))
+        return log_record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    records = make_records(args.records, missing=0)
+    formatters = [
+        ('previous', PreviousJSONFormatter(LOG_FORMAT, TIME_FORMAT)),
+        ('JSONFormatter', JSONFormatter(LOG_FORMAT, TIME_FORMAT)),
+    ]
+    if orjson is not None:
+        formatters.append(('JSONFormatter/orjson', JSONFormatter(LOG_FORMAT, TIME_FORMAT, backend='auto')))
+
+    for record in records:
+        assert formatters[1][1].format(record) == formatters[0][1].format(record)
+
+    for name, formatter in formatters:
+        elapsed = min(timeit.repeat(lambda: [formatter.format(record) for record in records], number=1, repeat=3))
+        print('{:20} {:8.1f} ms / {} records ({:.2f} us/record)'.format(
+            name, elapsed * 1000, args.records, elapsed * 1e6 / args.records))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare formatting log records with CustomLogFormatter against the previous implementation.
+
+    python -m benchmarks.log_formatting --records 100000 --missing 0.01
+"""
+from __future__ import print_function
+
+import argparse
+import logging
+import random
+import re
+import timeit
+
+from dmutils.logging import CustomLogFormatter, LOG_FORMAT, TIME_FORMAT
+
+
+class PreviousCustomLogFormatter(logging.Formatter):
+    # CustomLogFormatter before its fields and message templates were worked out ahead of time
+    FORMAT_STRING_FIELDS_PATTERN = re.compile(r'\((.+?)\)', re.IGNORECASE)
+
+    def add_fields(self, record):
+        for field in self.FORMAT_STRING_FIELDS_PATTERN.findall(self._fmt):
+            record.__dict__[field] = record.__dict__.get(field)
+        return record
+
+    def format(self, record):
+        record = self.add_fields(record)
+        msg = super(PreviousCustomLogFormatter, self).format(record)
+
+        try:
+            msg = msg.format(**record.__dict__)
+        except KeyError as e:
+            logging.getLogger('dmutils').exception("failed to format log message: {} not found".format(e))
+        return msg
+
+
+def make_records(count, missing, seed=0):
+    """`count` records like the request logs, with a `missing` share referring to a field that isn't given"""
+    rand = random.Random(seed)
+    records = []
+    for i in range(count):
+        if rand.random() < missing:
+            msg, extra = '{method} {url} {status} {user}', {}
+        elif i % 2:
+            msg = 'Loaded brief {brief_id} for supplier {supplier_code}'
+            extra = {'brief_id': i, 'supplier_code': rand.randint(1, 1000)}
+        else:
+            msg, extra = 'Rendering template', {}
+
+        extra.setdefault('method', 'GET')
+        extra.setdefault('url', 'https://marketplace.example.com/buyers/{}'.format(i))
+        extra.setdefault('status', 200)
+        record = logging.LogRecord('app', logging.INFO, '/app/views.py', 42, msg, None, None)
+        record.__dict__.update(extra)
+        record.app_name = 'buyer-frontend'
+        record.request_id = 'request-{}'.format(i)
+        records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--missing', type=float, default=0.01,
+                        help='share of records whose message refers to a missing field')
+    args = parser.parse_args()
+
+    # Keep the previous formatter's "failed to format" errors out of the output, but still pay for logging them
+    dmutils_logger = logging.getLogger('dmutils')
+    dmutils_logger.addHandler(logging.NullHandler())
+    dmutils_logger.propagate = False
+
+    records = make_records(args.records, args.missing)
+    previous = PreviousCustomLogFormatter(LOG_FORMAT, TIME_FORMAT)
+    current = CustomLogFormatter(LOG_FORMAT, TIME_FORMAT)
+
+    for record in records:
+        assert current.format(record) == previous.format(record)
+
+    for name, formatter in [('previous', previous), ('CustomLogFormatter', current)]:
+        elapsed = min(timeit.repeat(lambda: [formatter.format(record) for record in records], number=1, repeat=3))
+        print('{:20} {:8.1f} ms / {} records ({:.2f} us/record)'.format(
+            name, elapsed * 1000, args.records, elapsed * 1e6 / args.records))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Drive render_component from several threads against a stand-in render server (or a real one with --url), and report
+throughput and latency percentiles.
+
+    python -m benchmarks.render_load --renders 2000 --threads 8 --delay 0.01 --jitter 0.02 --error-rate 0.01
+    python -m benchmarks.render_load --config REACT_RENDER_CACHE=true --config REACT_RENDER_TIMEOUT=0.05
+
+--config values are parsed as JSON where possible, so numbers and booleans can be given as they'd be written in JSON.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import threading
+from collections import Counter
+
+from monotonic import monotonic
+
+from react.instrumentation import percentile
+from react.render import render_component
+from react.render_server import RenderServer
+from react.stub_server import StubRenderServer
+
+from .render_pooling import make_app
+
+
+def parse_config(items):
+    config = {}
+    for item in items:
+        key, _, value = item.partition('=')
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+
+def run_load(app, renderer, renders, threads, path='/widget/component.js', props=None):
+    """Render `path` `renders` times over `threads` threads. Returns throughput, latencies and counts of errors."""
+    per_thread = renders // threads
+    latencies = []
+    errors = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        thread_latencies = []
+        thread_errors = Counter()
+        with app.test_request_context('/benchmark'):
+            for _ in range(per_thread):
+                start = monotonic()
+                try:
+                    render_component(path, dict(props or {}), renderer=renderer)
+                except Exception as e:
+                    thread_errors[type(e).__name__] += 1
+                thread_latencies.append(monotonic() - start)
+
+        with lock:
+            latencies.extend(thread_latencies)
+            errors.update(thread_errors)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = monotonic()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    elapsed = monotonic() - start
+
+    return {
+        'renders': len(latencies),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'latencies': sorted(latencies),
+        'errors': dict(errors),
+    }
+
+
+def report(result):
+    latencies = result['latencies']
+    print('{} renders in {:.2f}s: {:.1f} renders/sec'.format(result['renders'], result['elapsed'], result['throughput']))
+    print('latency ms  p50 {:8.2f}  p95 {:8.2f}  p99 {:8.2f}  max {:8.2f}'.format(
+        percentile(latencies, 50) * 1000,
+        percentile(latencies, 95) * 1000,
+        percentile(latencies, 99) * 1000,
+        latencies[-1] * 1000,
+    ))
+    for error, count in sorted(result['errors'].items()):
+        print('{:6} {}'.format(count, error))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--url', help='Render server to use instead of the stand-in')
+    parser.add_argument('--delay', type=float, default=0, help='Stand-in render time, in seconds')
+    parser.add_argument('--jitter', type=float, default=0, help='Random extra stand-in render time, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of stand-in renders that fail')
+    parser.add_argument('--error-kind', choices=('http', 'render'), default='http')
+    parser.add_argument('--markup-size', type=int, default=0, help='Stand-in markup size, in characters')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--config', action='append', default=[], metavar='KEY=VALUE',
+                        help='App config, e.g. REACT_RENDER_CACHE=true')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = StubRenderServer(
+            delay=args.delay, jitter=args.jitter, error_rate=args.error_rate, error_kind=args.error_kind,
+            markup_size=args.markup_size, seed=args.seed,
+        ).start()
+        url = server.url
+
+    try:
+        app = make_app(url)
+        app.config.update(parse_config(args.config))
+        renderer = RenderServer()
+
+        run_load(app, renderer, args.threads * 10, args.threads)  # warm up
+        report(run_load(app, renderer, args.renders, args.threads))
+        renderer.transports.close()
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
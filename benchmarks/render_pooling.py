@@ -0,0 +1,73 @@
+"""
+Compare render throughput with and without the pooled render server transport.
+
+    python -m benchmarks.render_pooling --renders 2000 --threads 4
+"""
+from __future__ import print_function
+
+import argparse
+import threading
+
+import requests
+from flask import Flask
+from monotonic import monotonic
+
+from react.render_server import RenderServer
+from react.stub_server import StubRenderServer
+
+
+class UnpooledRenderServer(RenderServer):
+    # `requests.post` opens a new connection for every render - how RenderServer used to work.
+    transport = requests
+
+
+def make_app(url):
+    app = Flask(__name__)
+    app.config.update({
+        'SECRET_KEY': 'benchmark',
+        'REACT_RENDER': True,
+        'REACT_RENDER_URL': url,
+    })
+    return app
+
+
+def run(app, renderer, renders, threads):
+    per_thread = renders // threads
+    errors = []
+
+    def worker():
+        with app.test_request_context('/benchmark'):
+            try:
+                for _ in range(per_thread):
+                    renderer.render('/widget/component.js', {'foo': 'bar'})
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = monotonic()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    elapsed = monotonic() - start
+
+    if errors:
+        raise errors[0]
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--renders', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    with StubRenderServer() as server:
+        app = make_app(server.url)
+        for name, renderer in [('unpooled', UnpooledRenderServer()), ('pooled', RenderServer())]:
+            run(app, renderer, args.threads * 10, args.threads)  # warm up
+            print('{:10} {:8.1f} renders/sec'.format(name, run(app, renderer, args.renders, args.threads)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare render request serialization on a ~1MB props fixture.
+
+    python -m benchmarks.render_serialization --repeat 20
+"""
+from __future__ import print_function
+
+import argparse
+import hashlib
+import json
+import timeit
+
+from flask.json import JSONEncoder
+
+from react.serialization import dumps_props, orjson, serialize_options
+
+
+def make_props(size=1024 * 1024):
+    briefs = []
+    props = {'briefs': briefs, 'form_options': {'csrf_token': 'abc123'}}
+    while len(json.dumps(props)) < size:
+        briefs.append({
+            'id': len(briefs),
+            'title': 'Brief number {} for "Digital Marketplace"'.format(len(briefs)),
+            'summary': 'We need a team to <build> & "run" a service.\n' * 4,
+            'location': ['Sydney', 'Canberra'],
+            'published': True,
+        })
+    return props
+
+
+def double_encoded(props):
+    # How RenderServer serialized renders before the envelope was built around the serialized props
+    serialized_props = json.dumps(props, cls=JSONEncoder, sort_keys=True)
+    serialized_options = json.dumps({
+        'path': '/widget/component.js',
+        'serializedProps': serialized_props,
+        'toStaticMarkup': False,
+    }, sort_keys=True)
+    return serialized_options, hashlib.sha1(serialized_options.encode('utf-8')).hexdigest()
+
+
+def single_pass(backend, inline_props):
+    def serialize(props):
+        return serialize_options('/widget/component.js', dumps_props(props, backend), False, inline_props)
+    return serialize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    props = make_props()
+    cases = [
+        ('double encoded', double_encoded),
+        ('single pass', single_pass('json', False)),
+        ('single pass, inline props', single_pass('json', True)),
+    ]
+    if orjson is not None:
+        cases += [
+            ('orjson', single_pass('auto', False)),
+            ('orjson, inline props', single_pass('auto', True)),
+        ]
+
+    for name, serialize in cases:
+        body, _ = serialize(props)
+        elapsed = min(timeit.repeat(lambda: serialize(props), number=1, repeat=args.repeat))
+        print('{:28} {:8.2f} ms {:10} bytes'.format(name, elapsed * 1000, len(body)))
+
+
+if __name__ == '__main__':
+    main()
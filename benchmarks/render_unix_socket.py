@@ -0,0 +1,46 @@
+"""
+Compare pooled render throughput to a stand-in render server over TCP loopback and a unix domain socket.
+
+    python -m benchmarks.render_unix_socket --renders 2000 --threads 4
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from react.render_server import RenderServer
+from react.stub_server import StubRenderServer
+
+from .render_pooling import make_app, run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--renders', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    socket_dir = tempfile.mkdtemp()
+    try:
+        servers = [
+            ('tcp', StubRenderServer()),
+            ('unix', StubRenderServer(unix_socket=os.path.join(socket_dir, 'render.sock'))),
+        ]
+        for name, server in servers:
+            with server:
+                app = make_app(server.url)
+                renderer = RenderServer()
+                run(app, renderer, args.threads * 10, args.threads)  # warm up
+                renders_per_sec = run(app, renderer, args.renders, args.threads)
+                print('{:6} {:8.1f} renders/sec {:8.1f} us/render'.format(
+                    name, renders_per_sec, 1000000 / renders_per_sec
+                ))
+                renderer.transports.close()
+    finally:
+        shutil.rmtree(socket_dir)
+
+
+if __name__ == '__main__':
+    main()
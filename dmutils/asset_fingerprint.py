@@ -1,5 +1,51 @@
 import hashlib
-import codecs
+import io
+import json
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from six import text_type
+
+CHUNK_SIZE = 64 * 1024
+
+
+def hash_asset_file(asset_file_path, digest='md5'):
+    """Hex digest of a file, read in binary chunks so it works for any file without reading it all into memory"""
+    asset_hash = hashlib.new(digest)
+    with open(asset_file_path, 'rb') as asset_file:
+        for chunk in iter(lambda: asset_file.read(CHUNK_SIZE), b''):
+            asset_hash.update(chunk)
+    return asset_hash.hexdigest()
+
+
+def _asset_paths(filesystem_path):
+    for dirname, dirs, files in os.walk(filesystem_path):
+        for filename in files:
+            asset_path = os.path.relpath(os.path.join(dirname, filename), filesystem_path)
+            yield asset_path.replace(os.sep, '/')
+
+
+def build_manifest(filesystem_path='app/static/', digest='md5', processes=None):
+    """
+        Fingerprint every file under `filesystem_path`, hashing them in
+        parallel over a pool of `processes` processes (by default one per
+        CPU).
+    """
+    asset_paths = sorted(_asset_paths(filesystem_path))
+    file_paths = [os.path.join(filesystem_path, asset_path) for asset_path in asset_paths]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        fingerprints = executor.map(hash_asset_file, file_paths, [digest] * len(file_paths))
+        return {
+            'digest': digest,
+            'assets': dict(zip(asset_paths, fingerprints)),
+        }
+
+
+def write_manifest(manifest, manifest_path):
+    with io.open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        manifest_file.write(text_type(json.dumps(manifest, sort_keys=True, indent=2)))
 
 
 class AssetFingerprinter():
@@ -18,29 +64,80 @@ class AssetFingerprinter():
             {{ asset_fingerprinter.get_url('stylesheets/application.css') }}
 
         * 'app/static' is assumed to be the root for all asset files
+
+        One fingerprinter can be shared between threads. Call `preload` to
+        fingerprint every asset up front, or `load_manifest` to use the
+        fingerprints from a manifest written by `build_manifest`, so none are
+        read while serving requests. With `check_mtime` (for development) an
+        asset is fingerprinted again whenever its modification time changes.
     """
 
-    def __init__(self, asset_root='/static/', filesystem_path='app/static/'):
+    def __init__(self, asset_root='/static/', filesystem_path='app/static/', check_mtime=False, digest='md5'):
         self._cache = {}
+        self._mtimes = {}
         self._asset_root = asset_root
         self._filesystem_path = filesystem_path
+        self._check_mtime = check_mtime
+        self._digest = digest
+        self._lock = threading.Lock()
+
+    @property
+    def filesystem_path(self):
+        return self._filesystem_path
 
     def get_url(self, asset_path):
-        if asset_path not in self._cache:
-            self._cache[asset_path] = (
-                self._asset_root +
-                asset_path +
-                '?' +
-                self.get_asset_fingerprint(self._filesystem_path + asset_path)
-            )
-        return self._cache[asset_path]
+        url = self._cache.get(asset_path)
+        if url is None or (self._check_mtime and self._modified(asset_path)):
+            url = self._fingerprint(asset_path)
+        return url
+
+    def get_fingerprint(self, asset_path):
+        return self.get_url(asset_path).rsplit('?', 1)[1]
+
+    def preload(self):
+        """Fingerprint every file under the filesystem path. Returns the number fingerprinted."""
+        count = 0
+        for asset_path in _asset_paths(self._filesystem_path):
+            self._fingerprint(asset_path)
+            count += 1
+        return count
+
+    def load_manifest(self, manifest_path):
+        """Use the fingerprints in a manifest. Returns the number loaded."""
+        with io.open(manifest_path, encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        if manifest['digest'] != self._digest:
+            raise ValueError('Asset manifest {} uses {}, not {}'.format(manifest_path, manifest['digest'], self._digest))
+
+        urls = dict(
+            (asset_path, self._asset_root + asset_path + '?' + fingerprint)
+            for asset_path, fingerprint in manifest['assets'].items()
+        )
+        with self._lock:
+            self._cache.update(urls)
+            for asset_path in urls:
+                self._mtimes[asset_path] = None
+        return len(urls)
+
+    def _fingerprint(self, asset_path):
+        file_path = self._filesystem_path + asset_path
+        mtime = self._mtime(file_path) if self._check_mtime else None
+        url = self._asset_root + asset_path + '?' + self.get_asset_fingerprint(file_path)
+
+        with self._lock:
+            self._cache[asset_path] = url
+            self._mtimes[asset_path] = mtime
+        return url
+
+    def _modified(self, asset_path):
+        return self._mtime(self._filesystem_path + asset_path) != self._mtimes.get(asset_path)
+
+    def _mtime(self, file_path):
+        try:
+            return os.path.getmtime(file_path)
+        except OSError:
+            return None
 
     def get_asset_fingerprint(self, asset_file_path):
-        return hashlib.md5(
-            self.get_asset_file_contents(asset_file_path).encode('utf-8')
-        ).hexdigest()
-
-    def get_asset_file_contents(self, asset_file_path):
-        with codecs.open(asset_file_path, encoding='utf-8') as asset_file:
-            contents = asset_file.read()
-        return contents
+        return hash_asset_file(asset_file_path, self._digest)
@@ -15,7 +15,8 @@ from flask_script import Manager, Server
 from flask_login import current_user
 from werkzeug.contrib.fixers import ProxyFix
 
-from .asset_fingerprint import AssetFingerprinter
+from .asset_fingerprint import AssetFingerprinter, build_manifest, write_manifest
+from .static_assets import StaticAssetMiddleware
 from .user import User, user_logging_string
 
 from dmutils import terms_of_use
@@ -23,6 +24,8 @@ from dmutils.forms import is_csrf_token_valid
 
 from .csrf import check_valid_csrf
 
+DEFAULT_ASSET_MANIFEST = 'app/asset-manifest.json'
+
 
 def init_app(
         application,
@@ -155,13 +158,36 @@ def init_frontend_app(application, data_api_client, login_manager, template_dirs
 
         return response
 
+    # One fingerprinter for the app, so assets are only read and hashed once. In debug mode assets are hashed again
+    # when they change.
+    asset_fingerprinter = AssetFingerprinter(
+        asset_root=application.config['ASSET_PATH'] + '/',
+        check_mtime=application.debug,
+        digest=application.config.get('DM_ASSET_DIGEST', 'md5')
+    )
+    asset_manifest = application.config.get('DM_ASSET_MANIFEST', DEFAULT_ASSET_MANIFEST)
+    if asset_manifest and os.path.exists(asset_manifest):
+        asset_fingerprinter.load_manifest(asset_manifest)
+    elif application.config.get('DM_ASSET_PRELOAD', not application.debug):
+        asset_fingerprinter.preload()
+    application.extensions['asset_fingerprinter'] = asset_fingerprinter
+
+    if application.config.get('DM_SERVE_STATIC_ASSETS', True):
+        # Serve assets without going through the app's before and after request handlers
+        application.wsgi_app = StaticAssetMiddleware(
+            application.wsgi_app,
+            application.config['ASSET_PATH'],
+            asset_fingerprinter,
+            application.config.get('DM_DEFAULT_CACHE_MAX_AGE', 0)
+        )
+
     @application.context_processor
     def inject_global_template_variables():
         template_data = {
             'pluralize': pluralize,
             'header_class': 'with-proposition',
             'asset_path': application.config['ASSET_PATH'] + '/',
-            'asset_fingerprinter': AssetFingerprinter(asset_root=application.config['ASSET_PATH'] + '/')
+            'asset_fingerprinter': asset_fingerprinter
         }
         return template_data
 
@@ -213,6 +239,29 @@ def init_manager(application, port, extra_directories=()):
         from waitress import serve
         serve(application, port=port)
 
+    @manager.command
+    def prerender(output_dir=None):
+        """Prerender the static React components in REACT_RENDER_PRERENDER_COMPONENTS."""
+        # react imports dmutils, so can't be imported when this module is
+        from react.prerender import prerender_components
+        from react.render_server import render_server
+
+        output_dir = output_dir or manager.app.config['REACT_RENDER_PRERENDER_DIR']
+        components = manager.app.config.get('REACT_RENDER_PRERENDER_COMPONENTS', [])
+        prerendered = prerender_components(components, output_dir, render_server)
+        print("Prerendered {} components to {}".format(len(prerendered), output_dir))
+
+    @manager.command
+    def fingerprint_assets(output=None, processes=None):
+        """Fingerprint everything in app/static and write an asset manifest."""
+        output = output or manager.app.config.get('DM_ASSET_MANIFEST', DEFAULT_ASSET_MANIFEST)
+        manifest = build_manifest(
+            digest=manager.app.config.get('DM_ASSET_DIGEST', 'md5'),
+            processes=int(processes) if processes else None
+        )
+        write_manifest(manifest, output)
+        print("Fingerprinted {} assets to {}".format(len(manifest['assets']), output))
+
     @manager.command
     def list_routes():
         """List URLs of all application routes."""
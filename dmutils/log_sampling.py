@@ -0,0 +1,154 @@
+import random
+import threading
+
+from monotonic import monotonic
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class TokenBucket(object):
+    """Allows `rate` events a second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class SamplingRule(object):
+    """
+        How many access log records to keep for requests matching a URL rule or a path prefix.
+
+        A `sample_rate` share of requests are logged, up to `rate_limit` records a second per route in bursts of up to
+        `burst` (by default the same as `rate_limit`). A rule with neither `rule` nor `prefix` matches every request.
+    """
+
+    def __init__(self, rule=None, prefix=None, sample_rate=1.0, rate_limit=None, burst=None):
+        if rule is not None and prefix is not None:
+            raise ValueError('A request log rule can match a URL rule or a path prefix, not both')
+
+        self.rule = rule
+        self.prefix = prefix
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.burst = max(burst or rate_limit or 0, 1)
+
+    @property
+    def logs_everything(self):
+        return self.sample_rate >= 1 and self.rate_limit is None
+
+    def matches(self, request):
+        if self.rule is not None:
+            return request.url_rule is not None and request.url_rule.rule == self.rule
+        if self.prefix is not None:
+            return request.path.startswith(self.prefix)
+        return True
+
+
+class RequestLogSampler(object):
+    """
+        Decides which requests get an access log record.
+
+        Requests that fail with a status of at least `always_log_status`, or that take `slow_threshold` seconds or
+        more, are always logged. Others are logged according to the first of `rules` they match, or `default`.
+
+        The number of records sampled out or rate limited for each route is kept, and handed out by `pop_summary`
+        at most every `summary_interval` seconds, so they can be logged.
+    """
+
+    def __init__(self, rules=(), default=None, always_log_status=400, slow_threshold=None, summary_interval=60):
+        self.rules = list(rules)
+        self.default = default or SamplingRule()
+        self.always_log_status = always_log_status
+        self.slow_threshold = slow_threshold
+        self.summary_interval = summary_interval
+
+        self.random = random.Random()
+        self._buckets = {}
+        self._suppressed = {}
+        self._summarised_at = monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            rules=[SamplingRule(**rule) for rule in config.get('DM_REQUEST_LOG_RULES') or ()],
+            default=SamplingRule(
+                sample_rate=config.get('DM_REQUEST_LOG_SAMPLE_RATE', 1.0),
+                rate_limit=config.get('DM_REQUEST_LOG_RATE_LIMIT'),
+                burst=config.get('DM_REQUEST_LOG_BURST'),
+            ),
+            always_log_status=config.get('DM_REQUEST_LOG_ALWAYS_STATUS', 400),
+            slow_threshold=config.get('DM_REQUEST_LOG_SLOW_THRESHOLD'),
+            summary_interval=config.get('DM_REQUEST_LOG_SUMMARY_INTERVAL', 60),
+        )
+
+    def match(self, request):
+        for rule in self.rules:
+            if rule.matches(request):
+                return rule
+        return self.default
+
+    def should_log(self, request, status, duration=None):
+        if status >= self.always_log_status:
+            return True
+        if self.slow_threshold is not None and duration is not None and duration >= self.slow_threshold:
+            return True
+
+        rule = self.match(request)
+        if rule.logs_everything:
+            return True
+
+        if request.url_rule is not None:
+            route = request.url_rule.rule
+        else:
+            route = rule.prefix or UNMATCHED_ROUTE
+
+        if rule.sample_rate < 1 and self.random.random() >= rule.sample_rate:
+            self._count(route, 'sampled_out')
+            return False
+
+        if rule.rate_limit is not None:
+            with self._lock:
+                now = monotonic()
+                bucket = self._buckets.get(route)
+                if bucket is None:
+                    bucket = self._buckets[route] = TokenBucket(rule.rate_limit, rule.burst, now)
+                allowed = bucket.take(now)
+            if not allowed:
+                self._count(route, 'rate_limited')
+                return False
+
+        return True
+
+    def _count(self, route, reason):
+        with self._lock:
+            counts = self._suppressed.get(route)
+            if counts is None:
+                counts = self._suppressed[route] = {'sampled_out': 0, 'rate_limited': 0}
+            counts[reason] += 1
+
+    def pop_summary(self, force=False):
+        """
+            Returns the number of records suppressed for each route since the last summary, if there were any and
+            `summary_interval` seconds have passed (or `force` is set). Otherwise returns None.
+        """
+        now = monotonic()
+        if not force and now - self._summarised_at < self.summary_interval:
+            return None
+
+        with self._lock:
+            if not force and now - self._summarised_at < self.summary_interval:
+                return None
+            self._summarised_at = now
+            summary, self._suppressed = self._suppressed, {}
+        return summary or None
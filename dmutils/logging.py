@@ -1,18 +1,34 @@
 from __future__ import absolute_import
 
+import copy
+import json
 import logging
 import sys
 import re
+import string
+import threading
+import traceback
+from datetime import date, datetime, time
+from inspect import istraceback
 from itertools import product
+from json.encoder import encode_basestring_ascii
+from monotonic import monotonic
 import requests
 import rollbar
+import six
+from six.moves import queue
 
 from flask import request, current_app, render_template_string
 from flask.ctx import has_request_context
 
 from dmutils.email import send_email, EmailError
+from dmutils.log_sampling import RequestLogSampler
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-from pythonjsonlogger.jsonlogger import JsonFormatter as BaseJSONFormatter
 
 LOG_FORMAT = '%(asctime)s %(app_name)s %(name)s %(levelname)s ' \
              '%(request_id)s "%(message)s" [in %(pathname)s:%(lineno)d]'
@@ -25,9 +41,34 @@ def init_app(app):
     app.config.setdefault('DM_LOG_LEVEL', 'INFO')
     app.config.setdefault('DM_APP_NAME', 'none')
     app.config.setdefault('DM_LOG_PATH', None)
+    app.config.setdefault('DM_LOG_ASYNC', False)
+    app.config.setdefault('DM_LOG_QUEUE_SIZE', 10000)
+    app.config.setdefault('DM_LOG_OVERFLOW', AsyncLogHandler.COUNT_DROPS)
+    app.config.setdefault('DM_REQUEST_LOG_RULES', [])
+    app.config.setdefault('DM_REQUEST_LOG_SAMPLE_RATE', 1.0)
+    app.config.setdefault('DM_REQUEST_LOG_RATE_LIMIT', None)
+    app.config.setdefault('DM_REQUEST_LOG_BURST', None)
+    app.config.setdefault('DM_REQUEST_LOG_ALWAYS_STATUS', 400)
+    app.config.setdefault('DM_REQUEST_LOG_SLOW_THRESHOLD', 1.0)
+    app.config.setdefault('DM_REQUEST_LOG_SUMMARY_INTERVAL', 60)
+
+    app.extensions['request_log_sampler'] = RequestLogSampler.from_config(app.config)
+
+    @app.before_request
+    def record_request_start():
+        request.environ['dmutils.request_start'] = monotonic()
 
     @app.after_request
     def after_request(response):
+        sampler = current_app.extensions.get('request_log_sampler')
+        if sampler is not None:
+            log_request_summary(sampler.pop_summary())
+
+            start = request.environ.get('dmutils.request_start')
+            duration = monotonic() - start if start is not None else None
+            if not sampler.should_log(request, response.status_code, duration):
+                return response
+
         log_handler = current_app.extensions.get('request_log_handler', None)
         if log_handler:
             log_handler(response)
@@ -54,11 +95,21 @@ def init_app(app):
     app.logger.debug("Logging configured")
 
 
-def configure_handler(handler, app, formatter):
+def log_request_summary(summary):
+    """Log the number of access log records suppressed for each route, as given by `RequestLogSampler.pop_summary`"""
+    for route, counts in sorted((summary or {}).items()):
+        current_app.logger.info(
+            'Suppressed {sampled_out} sampled out and {rate_limited} rate limited request logs for {route}',
+            extra=dict(counts, route=route),
+        )
+
+
+def configure_handler(handler, app, formatter, filters=True):
     handler.setLevel(logging.getLevelName(app.config['DM_LOG_LEVEL']))
     handler.setFormatter(formatter)
-    handler.addFilter(AppNameFilter(app.config['DM_APP_NAME']))
-    handler.addFilter(RequestIdFilter())
+    if filters:
+        handler.addFilter(AppNameFilter(app.config['DM_APP_NAME']))
+        handler.addFilter(RequestIdFilter())
 
     return handler
 
@@ -66,18 +117,33 @@ def configure_handler(handler, app, formatter):
 def get_handlers(app):
     handlers = []
     standard_formatter = CustomLogFormatter(LOG_FORMAT, TIME_FORMAT)
-    json_formatter = JSONFormatter(LOG_FORMAT, TIME_FORMAT)
+    json_formatter = JSONFormatter(LOG_FORMAT, TIME_FORMAT, backend=app.config.get('DM_LOG_JSON_BACKEND', 'json'))
+
+    # With async logging, records are given their app name and request id before they're queued, as the request
+    # has gone by the time they're written
+    filters = not app.config.get('DM_LOG_ASYNC')
 
     # Log to files if the path is set, otherwise log to stderr
     if app.config['DM_LOG_PATH']:
-        handler = logging.FileHandler(app.config['DM_LOG_PATH'])
-        handlers.append(configure_handler(handler, app, standard_formatter))
-
-        handler = logging.FileHandler(app.config['DM_LOG_PATH'] + '.json')
-        handlers.append(configure_handler(handler, app, json_formatter))
+        handler = FanOutLogHandler([
+            configure_handler(logging.FileHandler(app.config['DM_LOG_PATH']), app, standard_formatter, False),
+            configure_handler(logging.FileHandler(app.config['DM_LOG_PATH'] + '.json'), app, json_formatter, False),
+        ])
+        handlers.append(configure_handler(handler, app, standard_formatter, filters))
     else:
         handler = logging.StreamHandler(sys.stderr)
-        handlers.append(configure_handler(handler, app, standard_formatter))
+        handlers.append(configure_handler(handler, app, standard_formatter, filters))
+
+    if app.config.get('DM_LOG_ASYNC'):
+        handler = AsyncLogHandler(
+            handlers,
+            capacity=int(app.config.get('DM_LOG_QUEUE_SIZE', 10000)),
+            overflow=app.config.get('DM_LOG_OVERFLOW', AsyncLogHandler.COUNT_DROPS),
+        )
+        handler.setLevel(logging.getLevelName(app.config['DM_LOG_LEVEL']))
+        handler.addFilter(AppNameFilter(app.config['DM_APP_NAME']))
+        handler.addFilter(RequestIdFilter())
+        handlers = [handler]
 
     return handlers
 
@@ -106,42 +172,366 @@ class RequestIdFilter(logging.Filter):
         return record
 
 
+class AsyncLogHandler(logging.Handler):
+    """
+        Queues records to be passed to `handlers` by a background thread, so logging never waits for formatting or I/O.
+
+        At most `capacity` records are queued. When the queue is full, `overflow` decides what happens to a new record:
+
+        * 'block': wait for space in the queue
+        * 'drop-debug': drop DEBUG records, and wait for space for anything else
+        * 'count-drops': drop the record. A warning with the number of records dropped is logged once the queue has
+          space again.
+
+        Records still queued are written when the handler is closed, which `logging.shutdown` does at exit.
+    """
+
+    BLOCK = 'block'
+    DROP_DEBUG = 'drop-debug'
+    COUNT_DROPS = 'count-drops'
+
+    def __init__(self, handlers, capacity=10000, overflow=COUNT_DROPS):
+        if overflow not in (self.BLOCK, self.DROP_DEBUG, self.COUNT_DROPS):
+            raise ValueError('Unknown log queue overflow policy: {}'.format(overflow))
+
+        super(AsyncLogHandler, self).__init__()
+        self.handlers = handlers
+        self.overflow = overflow
+        self.queue = queue.Queue(capacity)
+
+        self.dropped = 0
+        self._unreported_drops = 0
+        self._drops_lock = threading.Lock()
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._listen, name='AsyncLogHandler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def prepare(self, record):
+        # Work out anything that depends on the state of the request thread, or on objects that could change before
+        # the record is written. A copy is queued, so other handlers of the record still get its args and exception.
+        prepared = copy.copy(record)
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        if record.exc_info:
+            prepared.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            prepared.exc_info = None
+        return prepared
+
+    def handle(self, record):
+        # Unlike logging.Handler.handle this doesn't hold the handler's lock while emitting. A thread waiting for space
+        # in the queue would otherwise stop the listener thread from logging anything.
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            record = self.prepare(record)
+            if threading.current_thread() is self._thread:
+                # Logged while writing another record. Waiting for space in the queue would block forever.
+                self._handle(record)
+                return
+
+            if self.overflow == self.BLOCK or (
+                self.overflow == self.DROP_DEBUG and record.levelno > logging.DEBUG
+            ):
+                self.queue.put(record)
+                return
+
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                with self._drops_lock:
+                    self.dropped += 1
+                    if self.overflow == self.COUNT_DROPS:
+                        self._unreported_drops += 1
+        except Exception:
+            self.handleError(record)
+
+    def _listen(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    return
+                self._handle(record)
+                self._report_drops()
+            except Exception:
+                # Keep the listener alive, or the queue would never be emptied again
+                self.handleError(record)
+            finally:
+                self.queue.task_done()
+
+    def _handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _report_drops(self):
+        if not self._unreported_drops:
+            return
+        with self._drops_lock:
+            dropped, self._unreported_drops = self._unreported_drops, 0
+
+        record = logging.LogRecord(
+            logger.name, logging.WARNING, __file__, 0, 'Log queue full: dropped {} log records'.format(dropped),
+            None, None
+        )
+        for log_filter in self.filters:
+            log_filter.filter(record)
+        self._handle(record)
+
+    def flush(self):
+        """Wait for every record queued so far to be written"""
+        if not self._closed:
+            self.queue.join()
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.queue.put(None)
+            self._thread.join()
+            for handler in self.handlers:
+                handler.flush()
+        super(AsyncLogHandler, self).close()
+
+
+class FanOutLogHandler(logging.Handler):
+    """
+        Writes each record to the streams of several handlers, each in the format of its own handler.
+
+        The record is filtered and its message interpolated once, by this handler and its formatter, and the result
+        shared between the handlers' formatters. They must have a `format_interpolated` method, as
+        `CustomLogFormatter` and `JSONFormatter` do. The handlers' own filters aren't used.
+    """
+
+    def __init__(self, handlers):
+        super(FanOutLogHandler, self).__init__()
+        self.handlers = handlers
+
+    def emit(self, record):
+        try:
+            message = self.formatter.interpolate(record)
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    self._write(handler, handler.formatter.format_interpolated(record, message))
+        except Exception:
+            self.handleError(record)
+
+    def _write(self, handler, line):
+        line += getattr(handler, 'terminator', '\n')
+        handler.acquire()
+        try:
+            try:
+                handler.stream.write(line)
+            except UnicodeError:
+                handler.stream.write(line.encode('utf-8'))
+            handler.flush()
+        finally:
+            handler.release()
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self):
+        for handler in self.handlers:
+            handler.close()
+        super(FanOutLogHandler, self).close()
+
+
 class CustomLogFormatter(logging.Formatter):
-    """Accepts a format string for the message and formats it with the extra fields"""
+    """
+        Accepts a format string for the message and formats it with the extra fields.
+
+        The `%(field)s` fields of the log format are worked out once, when the formatter is created. Each message
+        template is parsed the first time it's seen, and formatted with just the fields it refers to. Fields missing
+        from the log format default to None. A message that can't be formatted is logged unchanged, with a warning
+        logged the first time that happens to it.
+    """
+
+    FORMAT_STRING_FIELDS_PATTERN = re.compile(r'%\((.+?)\)', re.IGNORECASE)
+    MAX_CACHED_MESSAGES = 1000
 
-    FORMAT_STRING_FIELDS_PATTERN = re.compile(r'\((.+?)\)', re.IGNORECASE)
+    def __init__(self, fmt=None, datefmt=None):
+        super(CustomLogFormatter, self).__init__(fmt, datefmt)
+        self.fields = tuple(self.FORMAT_STRING_FIELDS_PATTERN.findall(self._fmt))
+        self._default_fields = frozenset(self.fields)
+        # The log format with its named fields made positional, to be filled in from `self.fields`
+        self._positional_fmt = self.FORMAT_STRING_FIELDS_PATTERN.sub('%', self._fmt)
+        self._uses_time = 'asctime' in self._default_fields
+        self._message_fields = {}
+        self._failed_messages = set()
 
     def add_fields(self, record):
-        for field in self.FORMAT_STRING_FIELDS_PATTERN.findall(self._fmt):
+        for field in self.fields:
             record.__dict__[field] = record.__dict__.get(field)
         return record
 
-    def format(self, record):
-        record = self.add_fields(record)
-        msg = super(CustomLogFormatter, self).format(record)
-
+    def message_fields(self, msg):
+        """Names of the fields referred to by message template `msg`"""
         try:
-            msg = msg.format(**record.__dict__)
-        except KeyError as e:
-            logger.exception("failed to format log message: {} not found".format(e))
+            return self._message_fields[msg]
+        except KeyError:
+            pass
+
+        if len(self._message_fields) >= self.MAX_CACHED_MESSAGES:
+            self._message_fields.clear()
+
+        fields = []
+        for _, field_name, _, _ in string.Formatter().parse(msg):
+            if field_name is not None:
+                fields.append(re.split(r'[.\[]', field_name, 1)[0])
+        self._message_fields[msg] = fields = tuple(set(fields))
+        return fields
+
+    def format_message(self, record):
+        msg = record.getMessage()
+        if '{' not in msg and '}' not in msg:
+            return msg
+
+        values = record.__dict__
+        try:
+            kwargs = {}
+            for field in self.message_fields(msg):
+                if field in values:
+                    kwargs[field] = values[field]
+                elif field in self._default_fields:
+                    kwargs[field] = None
+                else:
+                    raise KeyError(field)
+            return msg.format(**kwargs)
+        except (KeyError, AttributeError, IndexError, ValueError) as e:
+            if msg not in self._failed_messages:
+                if len(self._failed_messages) >= self.MAX_CACHED_MESSAGES:
+                    self._failed_messages.clear()
+                self._failed_messages.add(msg)
+                error = '{} not found'.format(e) if isinstance(e, KeyError) else repr(e)
+                # Escaped, as the warning is itself formatted as a message template
+                logger.warning("failed to format log message: %s", error.replace('{', '{{').replace('}', '}}'))
+            return msg
+
+    def interpolate(self, record):
+        """Set the record's time, and return its message with the fields filled in"""
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        return self.format_message(record)
+
+    def format(self, record):
+        return self.format_interpolated(record, self.interpolate(record))
+
+    def format_interpolated(self, record, message):
+        """Format a record given its interpolated message, with its time already set by `interpolate`"""
+        record.message = message
+        values = record.__dict__
+        msg = self._positional_fmt % tuple(values.get(field) for field in self.fields)
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            if msg[-1:] != '\n':
+                msg = msg + '\n'
+            msg = msg + record.exc_text
+        if getattr(record, 'stack_info', None):
+            if msg[-1:] != '\n':
+                msg = msg + '\n'
+            msg = msg + self.formatStack(record.stack_info)
         return msg
 
 
-class JSONFormatter(BaseJSONFormatter):
-    def process_log_record(self, log_record):
-        rename_map = {
-            "asctime": "time",
-            "request_id": "requestId",
-            "app_name": "application",
-        }
-        for key, newkey in rename_map.items():
-            log_record[newkey] = log_record.pop(key)
-        log_record['logType'] = "application"
-        try:
-            log_record['message'] = log_record['message'].format(**log_record)
-        except KeyError as e:
-            logger.exception("failed to format log message: {} not found".format(e))
-        return log_record
+def _json_default(obj):
+    # Encodes the same values as python-json-logger's encoder
+    if isinstance(obj, (date, datetime, time)):
+        return obj.isoformat()
+    if istraceback(obj):
+        return ''.join(traceback.format_tb(obj)).strip()
+    if isinstance(obj, Exception) or isinstance(obj, type):
+        return str(obj)
+    try:
+        return str(obj)
+    except Exception:
+        return None
+
+
+class JSONFormatter(CustomLogFormatter):
+    """
+        Formats records as JSON objects, with the keys in a fixed order.
+
+        The fields of the log format come first, except for `asctime`, `request_id` and `app_name`. Any exception comes
+        next as `exc_info`, followed by the extra fields. The last keys are `time`, `requestId`, `application` and
+        `logType`. The output is byte for byte what python-json-logger produced.
+
+        Strings and integers are encoded directly. Other values go through the stdlib encoder, or through orjson if it's
+        installed and `backend` is 'auto'. orjson gives equivalent JSON, but nested values have no spaces between
+        items and non-ASCII characters aren't escaped.
+    """
+
+    RENAMED_FIELDS = (('asctime', 'time'), ('request_id', 'requestId'), ('app_name', 'application'))
+    # LogRecord attributes that aren't written as extra fields
+    RESERVED_ATTRS = frozenset([
+        'args', 'asctime', 'created', 'exc_info', 'exc_text', 'filename', 'funcName', 'levelname', 'levelno',
+        'lineno', 'module', 'msecs', 'message', 'msg', 'name', 'pathname', 'process', 'processName',
+        'relativeCreated', 'stack_info', 'thread', 'threadName',
+    ])
+
+    def __init__(self, fmt=None, datefmt=None, backend='json'):
+        super(JSONFormatter, self).__init__(fmt, datefmt)
+        renamed = dict(self.RENAMED_FIELDS)
+        self._leading_fields = tuple(
+            (field, encode_basestring_ascii(field) + ': ') for field in self.fields if field not in renamed
+        )
+        self._trailing_fields = tuple(
+            (field, encode_basestring_ascii(key) + ': ') for field, key in self.RENAMED_FIELDS
+        )
+        self._skip_fields = self.RESERVED_ATTRS.union(self.fields)
+
+        if backend == 'auto' and orjson is not None:
+            self._encode_value = self._encode_with_orjson
+        else:
+            self._encode_value = json.JSONEncoder(default=_json_default).encode
+
+    def _encode_with_orjson(self, value):
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def encode(self, value):
+        if isinstance(value, six.string_types):
+            return encode_basestring_ascii(value)
+        if value is None:
+            return 'null'
+        if type(value) is int:
+            return str(value)
+        return self._encode_value(value)
+
+    def format_interpolated(self, record, message):
+        """Format a record given its interpolated message, with its time already set by `interpolate`"""
+        record.message = message
+        values = record.__dict__
+        encode = self.encode
+
+        items = [key + encode(values.get(field)) for field, key in self._leading_fields]
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            items.append('"exc_info": ' + encode(record.exc_text))
+
+        extra_fields = six.viewkeys(values) - self._skip_fields
+        if extra_fields:
+            # In the order they were added to the record
+            for field in (values if len(extra_fields) > 1 else extra_fields):
+                if field in extra_fields and not field.startswith('_'):
+                    items.append(encode_basestring_ascii(field) + ': ' + encode(values[field]))
+
+        for field, key in self._trailing_fields:
+            items.append(key + encode(values.get(field)))
+        items.append('"logType": "application"')
+
+        return '{' + ', '.join(items) + '}'
 
 
 def slack_escape(text):
@@ -0,0 +1,70 @@
+import mimetypes
+import os
+
+from werkzeug.http import parse_etags, quote_etag
+from werkzeug.security import safe_join
+from werkzeug.wsgi import FileWrapper, get_path_info, get_script_name
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class StaticAssetMiddleware(object):
+    """
+        Serves asset files under `url_path` before requests reach the Flask app.
+
+        Requests for an asset's fingerprinted URL (as given by `fingerprinter.get_url`) can be cached forever. Other
+        requests for an asset are cached for `max_age` seconds. Responses have the asset's fingerprint as their ETag,
+        and conditional requests get a 304 Not Modified. Requests for anything that isn't an asset file are passed on
+        to the app.
+    """
+
+    def __init__(self, app, url_path, fingerprinter, max_age):
+        self.app = app
+        self.url_path = url_path.rstrip('/') + '/'
+        self.fingerprinter = fingerprinter
+        self.max_age = max_age
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            return self.app(environ, start_response)
+
+        path = get_script_name(environ) + get_path_info(environ)
+        if not path.startswith(self.url_path):
+            return self.app(environ, start_response)
+
+        asset_path = path[len(self.url_path):]
+        file_path = safe_join(self.fingerprinter.filesystem_path, asset_path)
+        if file_path is None or not os.path.isfile(file_path):
+            return self.app(environ, start_response)
+
+        fingerprint = self.fingerprinter.get_fingerprint(asset_path)
+        if environ.get('QUERY_STRING') == fingerprint:
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = 'public, max-age={}'.format(self.max_age)
+        headers = [('Cache-Control', cache_control), ('ETag', quote_etag(fingerprint))]
+
+        if self._not_modified(environ, fingerprint):
+            start_response('304 Not Modified', headers)
+            return []
+
+        # Any encoding guessed from the file name is ignored: a `.gz` asset is served as it is, like send_file would
+        content_type, _ = mimetypes.guess_type(file_path)
+        asset_file = open(file_path, 'rb')
+        headers.extend([
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Content-Length', str(os.fstat(asset_file.fileno()).st_size)),
+        ])
+
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            asset_file.close()
+            return []
+
+        # Lets the server use sendfile where it can
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(asset_file, 64 * 1024)
+
+    def _not_modified(self, environ, fingerprint):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        return bool(if_none_match) and parse_etags(if_none_match).contains_weak(fingerprint)
@@ -0,0 +1,106 @@
+import threading
+from collections import deque
+
+from monotonic import monotonic
+
+from .instrumentation import percentile
+
+
+class Endpoint(object):
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0
+        self.unhealthy_until = None
+
+    def is_healthy(self, now):
+        return self.unhealthy_until is None or self.unhealthy_until <= now
+
+
+class EndpointBalancer(object):
+    """
+        Spreads renders over several render server endpoints.
+
+        Each render goes to the healthy endpoint with the fewest renders in flight. An endpoint is marked unhealthy for
+        `cooldown` seconds after `failure_threshold` renders to it fail in a row; if every endpoint is unhealthy they're
+        all used anyway. Latencies of the last `latency_window` successful renders are kept for working out when to
+        send a hedged request.
+    """
+
+    def __init__(self, urls, failure_threshold=3, cooldown=10, latency_window=100):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._latencies = deque(maxlen=latency_window)
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.hedged = 0
+
+    @property
+    def settings(self):
+        return (
+            tuple(endpoint.url for endpoint in self.endpoints),
+            self.failure_threshold,
+            self.cooldown,
+            self._latencies.maxlen,
+        )
+
+    def acquire(self, exclude=None):
+        """Pick an endpoint for a render, other than `exclude`. Returns None if there isn't one."""
+        with self._lock:
+            now = monotonic()
+            # Rotate the starting point, so ties are spread over the endpoints
+            self._next = (self._next + 1) % len(self.endpoints)
+            endpoints = self.endpoints[self._next:] + self.endpoints[:self._next]
+
+            candidates = [endpoint for endpoint in endpoints if endpoint is not exclude]
+            healthy = [endpoint for endpoint in candidates if endpoint.is_healthy(now)]
+            if not (healthy or candidates):
+                return None
+
+            endpoint = min(healthy or candidates, key=lambda e: e.outstanding)
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint, elapsed=None, failed=False):
+        with self._lock:
+            endpoint.outstanding -= 1
+
+            if failed:
+                endpoint.failures += 1
+                if endpoint.failures >= self.failure_threshold:
+                    endpoint.unhealthy_until = monotonic() + self.cooldown
+            else:
+                endpoint.failures = 0
+                endpoint.unhealthy_until = None
+                self._latencies.append(elapsed)
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedged += 1
+
+    def latency_percentile(self, pct, min_samples=20):
+        """Latency of recent renders at percentile `pct`, or None if fewer than `min_samples` have been seen"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        if len(latencies) < max(min_samples, 1):
+            return None
+        return percentile(latencies, pct)
+
+    def stats(self):
+        with self._lock:
+            now = monotonic()
+            return {
+                'hedged': self.hedged,
+                'endpoints': dict(
+                    (endpoint.url, {
+                        'outstanding': endpoint.outstanding,
+                        'failures': endpoint.failures,
+                        'healthy': endpoint.is_healthy(now),
+                    })
+                    for endpoint in self.endpoints
+                ),
+            }
@@ -0,0 +1,110 @@
+import threading
+from collections import deque
+
+from monotonic import monotonic
+
+from .signals import breaker_state_changed
+
+
+class CircuitBreaker(object):
+    """
+        Stops calling the render server while it's failing or slow.
+
+        Tracks the outcome of the last `window` renders. Once at least `min_requests` have been seen and the share that
+        failed (or took longer than `latency_budget` seconds) reaches `error_threshold`, the breaker opens and
+        `allow_request` returns False. After `reset_timeout` seconds a single trial render is let through: if it
+        succeeds the breaker closes, otherwise it opens again. Renders that finish while the breaker is open were let
+        through before it opened, so their outcomes are ignored.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, error_threshold=0.5, min_requests=10, window=20, reset_timeout=30, latency_budget=None):
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.latency_budget = latency_budget
+
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_in_flight = False
+        # Re-entrant so state change receivers can read the breaker's stats
+        self._lock = threading.RLock()
+
+        self.rejected = 0
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0}
+
+    @property
+    def settings(self):
+        return (self.error_threshold, self.min_requests, self.window, self.reset_timeout, self.latency_budget)
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self, elapsed):
+        if self.latency_budget is not None and elapsed > self.latency_budget:
+            self.record_failure()
+            return
+
+        with self._lock:
+            if self.state == self.OPEN:
+                # A render let through before the breaker opened, which says nothing new
+                return
+            if self.state == self.HALF_OPEN:
+                self._outcomes.clear()
+                self._set_state(self.CLOSED)
+            else:
+                self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                # Renders let through before the breaker opened mustn't open it again, and push back the trial render
+                return
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+
+            self._outcomes.append(False)
+            if len(self._outcomes) >= self.min_requests:
+                failures = self._outcomes.count(False)
+                if failures >= self.error_threshold * len(self._outcomes):
+                    self._open()
+
+    def _open(self):
+        self._opened_at = monotonic()
+        self._outcomes.clear()
+        self._set_state(self.OPEN)
+
+    def _set_state(self, state):
+        old_state = self.state
+        self.state = state
+        self._trial_in_flight = False
+        self.transitions[state] += 1
+        breaker_state_changed.send(self, old_state=old_state, new_state=state)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'state': self.state,
+                'rejected': self.rejected,
+            }
+            for state, count in self.transitions.items():
+                stats['{}_count'.format(state)] = count
+            return stats
@@ -0,0 +1,53 @@
+import threading
+
+
+class BundleManifest(object):
+    """
+        A render server file map, with the URL of each file worked out up front.
+
+        Shared by every component rendered with the same files, so they don't each keep a copy of the map.
+    """
+
+    __slots__ = ('files', 'bundle_url', 'urls', 'vendor_url')
+
+    def __init__(self, files, bundle_url):
+        self.files = files
+        self.bundle_url = bundle_url
+        self.urls = dict((key, bundle_url + filename) for key, filename in files.items())
+        self.vendor_url = self.urls.get('vendor', bundle_url + 'vendor.js')
+
+
+class BundleIndex(object):
+    """
+        Process-wide index of render server file maps, keyed by their contents.
+
+        A render server sends the same file map with every render until its bundles are rebuilt, so in practice this
+        holds one or two manifests. If more than `max_entries` different maps are seen the index starts again.
+    """
+
+    def __init__(self, max_entries=100):
+        self.max_entries = max_entries
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def get(self, files, bundle_url):
+        key = (bundle_url, tuple(sorted(files.items())))
+        manifest = self._manifests.get(key)
+        if manifest is None:
+            with self._lock:
+                manifest = self._manifests.get(key)
+                if manifest is None:
+                    if len(self._manifests) >= self.max_entries:
+                        self._manifests.clear()
+                    manifest = self._manifests[key] = BundleManifest(dict(files), bundle_url)
+        return manifest
+
+    def clear(self):
+        with self._lock:
+            self._manifests.clear()
+
+    def __len__(self):
+        return len(self._manifests)
+
+
+bundle_index = BundleIndex()
@@ -0,0 +1,164 @@
+import threading
+from collections import OrderedDict
+
+from concurrent.futures import ThreadPoolExecutor
+from monotonic import monotonic
+
+
+class CacheEntry(object):
+    __slots__ = ('value', 'size', 'expires', 'stale_until')
+
+    def __init__(self, value, size, expires, stale_until):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.stale_until = stale_until
+
+
+class RenderCache(object):
+    """
+        Thread-safe in-process LRU cache with TTL expiry, bounded by number of entries and total size.
+
+        Entry sizes are given by the caller when storing a value. Entries larger than `max_bytes` are never stored.
+
+        Expired entries are kept for a further `max_stale` seconds, during which `lookup` still returns them (flagged
+        as stale) so they can be served while they're refreshed.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=50 * 1024 * 1024, ttl=300, max_stale=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_stale = max_stale
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def settings(self):
+        return (self.max_entries, self.max_bytes, self.ttl, self.max_stale)
+
+    def get(self, key):
+        value, stale = self.lookup(key, allow_stale=False)
+        return value
+
+    def lookup(self, key, allow_stale=True):
+        """Returns the value for `key` (or None) and whether it's stale"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            now = monotonic()
+            if entry.stale_until <= now:
+                self._bytes -= entry.size
+                self.expirations += 1
+                self.misses += 1
+                return None, False
+
+            # Re-insert to mark as most recently used
+            self._entries[key] = entry
+
+            if entry.expires <= now:
+                if not allow_stale:
+                    self.misses += 1
+                    return None, False
+                self.stale_hits += 1
+                return entry.value, True
+
+            self.hits += 1
+            return entry.value, False
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._bytes -= old_entry.size
+
+            expires = monotonic() + self.ttl
+            self._entries[key] = CacheEntry(value, size, expires, expires + self.max_stale)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class BackgroundRefresher(object):
+    """
+        Runs cache refreshes on a small thread pool.
+
+        At most `max_workers` refreshes are pending at once, and only one per key. Refreshes asked for beyond that are
+        skipped rather than queued, as the stale entry can keep being served until a later request refreshes it.
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        self.scheduled = 0
+        self.skipped = 0
+
+    def refresh(self, key, fn, *args):
+        """Call `fn(*args)` in the background unless `key` is already being refreshed. Returns whether it was."""
+        with self._lock:
+            if key in self._refreshing or len(self._refreshing) >= self.max_workers:
+                self.skipped += 1
+                return False
+            self._refreshing.add(key)
+            self.scheduled += 1
+
+        self._executor.submit(self._run, key, fn, args)
+        return True
+
+    def _run(self, key, fn, args):
+        try:
+            fn(*args)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'refreshing': len(self._refreshing),
+                'scheduled': self.scheduled,
+                'skipped': self.skipped,
+            }
@@ -0,0 +1,93 @@
+import threading
+from collections import defaultdict, deque
+
+from flask import current_app
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))
+    return sorted_values[index]
+
+
+class PathMetrics(object):
+    def __init__(self, fields, window):
+        self.count = 0
+        self.statuses = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.samples = dict((field, deque(maxlen=window)) for field in fields)
+
+
+class RenderMetrics(object):
+    """
+        Rolling per-component render metrics.
+
+        Keeps the last `window` samples of each timing and size for every component path, along with counts of render
+        statuses and error classes.
+    """
+
+    FIELDS = ('time', 'serialization_time', 'request_bytes', 'response_bytes')
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def record(self, path, stats):
+        with self._lock:
+            metrics = self._paths.get(path)
+            if metrics is None:
+                metrics = self._paths[path] = PathMetrics(self.FIELDS, self.window)
+
+            metrics.count += 1
+            metrics.statuses[stats['status']] += 1
+            if stats.get('error'):
+                metrics.errors[stats['error']] += 1
+            for field in self.FIELDS:
+                if stats.get(field) is not None:
+                    metrics.samples[field].append(stats[field])
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Counts, and percentiles of each timing and size, by component path"""
+        with self._lock:
+            paths = dict(
+                (path, (metrics.count, dict(metrics.statuses), dict(metrics.errors), dict(
+                    (field, sorted(samples)) for field, samples in metrics.samples.items()
+                )))
+                for path, metrics in self._paths.items()
+            )
+
+        summary = {}
+        for path, (count, statuses, errors, samples) in paths.items():
+            summary[path] = {'count': count, 'statuses': statuses, 'errors': errors}
+            for field, values in samples.items():
+                summary[path][field] = dict(
+                    ('p{}'.format(pct), percentile(values, pct)) for pct in percentiles
+                ) if values else {}
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._paths.clear()
+
+
+def log_render_stats(sender, path, stats):
+    """
+        `component_rendered` receiver that logs each render.
+
+        Usage:
+
+            component_rendered.connect(log_render_stats)
+    """
+    current_app.logger.info(
+        'react.render {component} {status} in {render_time:.3f}s',
+        extra={
+            'component': path,
+            'status': stats['status'],
+            'render_time': stats['time'],
+            'serialization_time': stats.get('serialization_time'),
+            'request_bytes': stats.get('request_bytes'),
+            'response_bytes': stats.get('response_bytes'),
+            'error': stats.get('error'),
+        }
+    )
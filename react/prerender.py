@@ -0,0 +1,100 @@
+import copy
+import hashlib
+import io
+import json
+import os
+
+from flask import current_app
+from flask.json import JSONEncoder
+from six import text_type
+
+from .exceptions import RenderServerError
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def props_key(props):
+    """Identifies a component's props as they're passed to `render_component`, before the default props are added"""
+    serialized = json.dumps(props or {}, cls=JSONEncoder, sort_keys=True)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+class PrerenderedComponent(object):
+    __slots__ = ('markup', 'slug', 'files')
+
+    def __init__(self, markup, slug, files):
+        self.markup = markup
+        self.slug = slug
+        self.files = files
+
+
+class PrerenderedComponents(object):
+    """
+        Static markup components prerendered by `prerender_components`, loaded from `directory` into memory.
+
+        A directory without a manifest gives an empty set of components, so renders fall through to the render server.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._components = {}
+
+        manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            return
+
+        with io.open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        for entry in manifest['components']:
+            with io.open(os.path.join(directory, entry['markup']), encoding='utf-8') as f:
+                markup = f.read()
+            self._components[(entry['path'], entry['props_key'])] = PrerenderedComponent(
+                markup, entry['slug'], entry['files']
+            )
+
+    def get(self, path, props):
+        return self._components.get((path, props_key(props)))
+
+    def __len__(self):
+        return len(self._components)
+
+
+def prerender_components(components, directory, renderer, location='/'):
+    """
+        Render (path, props) pairs as static markup and write them to `directory`, along with a manifest.
+
+        Components are rendered in a request for `location`, with the CSRF token placeholder in place of a session's
+        token, so their markup must not depend on the path or config of the requests they're served to. Raises
+        RenderServerError if a component isn't rendered by the render server. Must be called inside an app context.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    entries = []
+    with current_app.test_request_context(location):
+        for path, props in components:
+            key = props_key(props)
+            serialized_props, _ = renderer.serialize_props(copy.deepcopy(props), csrf_placeholder=True)
+            component = renderer._render(renderer.url, path, serialized_props, True, None)
+            # Without this, a fallback render's empty markup would be served as the component forever
+            status = component.stats.get('status')
+            if status not in ('rendered', 'cached'):
+                raise RenderServerError('Could not prerender {}: render was {}'.format(path, status))
+
+            markup_filename = '{}.html'.format(hashlib.sha1('{}:{}'.format(path, key).encode('utf-8')).hexdigest())
+            with io.open(os.path.join(directory, markup_filename), 'w', encoding='utf-8') as f:
+                f.write(component.markup)
+
+            entries.append({
+                'path': path,
+                'props_key': key,
+                'slug': component.slug,
+                'files': component.files,
+                'markup': markup_filename,
+            })
+
+    with io.open(os.path.join(directory, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        f.write(text_type(json.dumps({'components': entries}, sort_keys=True, indent=2)))
+
+    return entries
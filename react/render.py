@@ -4,3 +4,7 @@ from .render_server import render_server
 
 def render_component(path, props=None, to_static_markup=False, renderer=render_server, request_headers=None):
     return renderer.render(path, props, to_static_markup, request_headers)
+
+
+def render_components(components, to_static_markup=False, renderer=render_server, request_headers=None):
+    return renderer.render_many(components, to_static_markup, request_headers)
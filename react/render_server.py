@@ -1,42 +1,74 @@
-import json
-import hashlib
+import threading
+from functools import partial
 import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from flask import current_app
-from flask.json import JSONEncoder
+from monotonic import monotonic
 from flask import request
 
 from .exceptions import ReactRenderingError, RenderServerError
+from .balancer import EndpointBalancer
+from .breaker import CircuitBreaker
+from .bundles import BundleManifest, bundle_index
+from .cache import BackgroundRefresher, RenderCache
+from .instrumentation import RenderMetrics
+from .prerender import PrerenderedComponents
+from .serialization import dumps_props, gzip_compress, serialize_options
+from .signals import component_rendered
+from .singleflight import SingleFlight
+from .transport import TransportPool
 from dmutils.csrf import get_csrf_token
 
-from six import python_2_unicode_compatible
+from six import python_2_unicode_compatible, string_types
+
+# Stands in for the session's CSRF token in renders that should be shared between users. Survives HTML and JSON escaping
+# unchanged, so it can be swapped for the real token in both the markup and the serialized props.
+CSRF_TOKEN_PLACEHOLDER = '__DM_CSRF_TOKEN_PLACEHOLDER__'
+
+
+def endpoint_urls(url):
+    """REACT_RENDER_URL as a list of render server URLs. It can be a list, or a comma separated string."""
+    if isinstance(url, string_types):
+        return [endpoint.strip() for endpoint in url.split(',') if endpoint.strip()]
+    return list(url)
 
 
 @python_2_unicode_compatible
 class RenderedComponent(object):
-    def __init__(self, markup, props, slug=None, files=None):
+    def __init__(self, markup, props, slug=None, files=None, error=None, stats=None):
         self.markup = markup
         self.props = props
         self.slug = slug
-        self.files = files or {}
+        # A BundleManifest, or a file map that's looked up in bundle_index when it's first used, so a component can be
+        # made outside of an app context
+        self._bundles = files
+        self.error = error
+        self.stats = stats or {}
 
     def __str__(self):
         return self.markup
 
+    @property
+    def bundles(self):
+        bundles = self._bundles
+        if not isinstance(bundles, BundleManifest):
+            # A file map from the render server is shared with every other component rendered with the same files
+            bundles = self._bundles = bundle_index.get(bundles or {}, current_app.config.get('REACT_BUNDLE_URL', '/'))
+        return bundles
+
+    @property
+    def files(self):
+        return self.bundles.files
+
     def get_bundle(self):
-        bundle_url = current_app.config.get('REACT_BUNDLE_URL', '/')
-        return bundle_url + self.files.get(self.slug)
+        return self.bundles.urls[self.slug]
 
     def get_vendor_bundle(self):
-        bundle_url = current_app.config.get('REACT_BUNDLE_URL', '/')
-        return bundle_url + self.files.get('vendor', 'vendor.js')
+        return self.bundles.vendor_url
 
     def get_file(self, key=''):
         # If bundle doesn't contain requested file, don't return half a url.
-        if key not in self.files:
-            return None
-
-        bundle_url = current_app.config.get('REACT_BUNDLE_URL', '/')
-        return bundle_url + self.files.get(key)
+        return self.bundles.urls.get(key)
 
     def get_slug(self):
         return self.slug
@@ -47,22 +79,202 @@ class RenderedComponent(object):
     def render(self):
         return str(self.markup)
 
+    def with_csrf_token(self, csrf_token):
+        """Copy of this component with the CSRF token placeholder replaced by the session's real token"""
+        return RenderedComponent(
+            self.markup.replace(CSRF_TOKEN_PLACEHOLDER, csrf_token),
+            self.props.replace(CSRF_TOKEN_PLACEHOLDER, csrf_token),
+            self.slug,
+            self._bundles,
+            self.error,
+            self.stats
+        )
+
 
 class RenderServer(object):
+    def __init__(self):
+        self.transports = TransportPool()
+        self.in_flight = SingleFlight()
+        self._cache = None
+        self._refresher = None
+        self._breaker = None
+        self._balancer = None
+        self._hedge_executor = None
+        self._hedge_slots = None
+        self._executor = None
+        self._executor_workers = None
+        self._metrics = None
+        self._prerendered_components = None
+        self._lock = threading.Lock()
+
     @property
     def url(self):
         return current_app.config.get('REACT_RENDER_URL', '')
 
-    def render(self, path, props=None, to_static_markup=False, request_headers=None):
-        url = self.url
+    @property
+    def transport(self):
+        config = current_app.config
+        return self.transports.get(
+            pool_size=int(config.get('REACT_RENDER_POOL_SIZE', 10)),
+            keep_alive=bool(config.get('REACT_RENDER_KEEP_ALIVE', True)),
+            retries=int(config.get('REACT_RENDER_RETRIES', 0)),
+            backoff_factor=float(config.get('REACT_RENDER_RETRY_BACKOFF', 0)),
+        )
+
+    @property
+    def timeout(self):
+        config = current_app.config
+        connect_timeout = config.get('REACT_RENDER_CONNECT_TIMEOUT', None)
+        read_timeout = config.get('REACT_RENDER_TIMEOUT', None)
+        latency_budget = config.get('REACT_RENDER_LATENCY_BUDGET', None)
+
+        if read_timeout is not None:
+            read_timeout = float(read_timeout)
+        # Don't wait any longer than the latency budget for a render
+        if latency_budget is not None and (read_timeout is None or float(latency_budget) < read_timeout):
+            read_timeout = float(latency_budget)
+
+        return (
+            float(connect_timeout) if connect_timeout is not None else None,
+            read_timeout,
+        )
+
+    @property
+    def cache(self):
+        config = current_app.config
+        if not config.get('REACT_RENDER_CACHE', False):
+            return None
+
+        settings = (
+            int(config.get('REACT_RENDER_CACHE_MAX_ENTRIES', 1000)),
+            int(config.get('REACT_RENDER_CACHE_MAX_BYTES', 50 * 1024 * 1024)),
+            float(config.get('REACT_RENDER_CACHE_TTL', 300)),
+            float(config.get('REACT_RENDER_CACHE_MAX_STALE', 0)),
+        )
+        cache = self._cache
+        if cache is None or cache.settings != settings:
+            with self._lock:
+                cache = self._cache
+                if cache is None or cache.settings != settings:
+                    cache = self._cache = RenderCache(*settings)
+        return cache
+
+    @property
+    def refresher(self):
+        max_workers = int(current_app.config.get('REACT_RENDER_CACHE_REFRESH_WORKERS', 2))
+        if self._refresher is None or self._refresher.max_workers != max_workers:
+            with self._lock:
+                if self._refresher is None or self._refresher.max_workers != max_workers:
+                    if self._refresher is not None:
+                        self._refresher.shutdown(wait=False)
+                    self._refresher = BackgroundRefresher(max_workers)
+        return self._refresher
 
+    @property
+    def breaker(self):
+        config = current_app.config
+        if not config.get('REACT_RENDER_BREAKER', False):
+            return None
+
+        latency_budget = config.get('REACT_RENDER_LATENCY_BUDGET', None)
+        settings = (
+            float(config.get('REACT_RENDER_BREAKER_ERROR_THRESHOLD', 0.5)),
+            int(config.get('REACT_RENDER_BREAKER_MIN_REQUESTS', 10)),
+            int(config.get('REACT_RENDER_BREAKER_WINDOW', 20)),
+            float(config.get('REACT_RENDER_BREAKER_RESET_TIMEOUT', 30)),
+            float(latency_budget) if latency_budget is not None else None,
+        )
+        breaker = self._breaker
+        if breaker is None or breaker.settings != settings:
+            with self._lock:
+                breaker = self._breaker
+                if breaker is None or breaker.settings != settings:
+                    breaker = self._breaker = CircuitBreaker(*settings)
+        return breaker
+
+    def balancer(self, urls):
+        config = current_app.config
+        settings = (
+            tuple(urls),
+            int(config.get('REACT_RENDER_ENDPOINT_FAILURES', 3)),
+            float(config.get('REACT_RENDER_ENDPOINT_COOLDOWN', 10)),
+            int(config.get('REACT_RENDER_LATENCY_WINDOW', 100)),
+        )
+        balancer = self._balancer
+        if balancer is None or balancer.settings != settings:
+            with self._lock:
+                balancer = self._balancer
+                if balancer is None or balancer.settings != settings:
+                    balancer = self._balancer = EndpointBalancer(*settings)
+        return balancer
+
+    @property
+    def hedge_executor(self):
+        # Separate from the batch render pool, so hedged requests never wait behind the renders that sent them
+        if self._hedge_executor is None:
+            with self._lock:
+                if self._hedge_executor is None:
+                    max_workers = int(current_app.config.get('REACT_RENDER_HEDGE_WORKERS', 10))
+                    # One for each worker, taken while a request is sent from the pool, so none are ever queued
+                    self._hedge_slots = threading.BoundedSemaphore(max_workers)
+                    self._hedge_executor = ThreadPoolExecutor(max_workers=max_workers)
+        return self._hedge_executor
+
+    @property
+    def executor(self):
+        max_workers = int(current_app.config.get('REACT_RENDER_BATCH_WORKERS', 10))
+        if self._executor is None or self._executor_workers != max_workers:
+            with self._lock:
+                if self._executor is None or self._executor_workers != max_workers:
+                    if self._executor is not None:
+                        self._executor.shutdown(wait=False)
+                    self._executor = ThreadPoolExecutor(max_workers=max_workers)
+                    self._executor_workers = max_workers
+        return self._executor
+
+    @property
+    def metrics(self):
+        window = int(current_app.config.get('REACT_RENDER_METRICS_WINDOW', 1000))
+        metrics = self._metrics
+        if metrics is None or metrics.window != window:
+            with self._lock:
+                metrics = self._metrics
+                if metrics is None or metrics.window != window:
+                    metrics = self._metrics = RenderMetrics(window)
+        return metrics
+
+    @property
+    def prerendered(self):
+        directory = current_app.config.get('REACT_RENDER_PRERENDER_DIR', None)
+        if not directory:
+            return None
+
+        prerendered = self._prerendered_components
+        if prerendered is None or prerendered.directory != directory:
+            with self._lock:
+                prerendered = self._prerendered_components
+                if prerendered is None or prerendered.directory != directory:
+                    prerendered = self._prerendered_components = PrerenderedComponents(directory)
+        return prerendered
+
+    def serialize_props(self, props=None, csrf_placeholder=None):
+        """
+            Add the default server render props and serialize them.
+
+            Returns the serialized props and, if they were serialized with the CSRF token placeholder, the real token
+            to substitute into the rendered component. The placeholder is used if `csrf_placeholder` is set, or if it's
+            None and REACT_RENDER_CSRF_PLACEHOLDER is.
+        """
         if props is None:
             props = {}
 
         if 'form_options' not in props:
             props['form_options'] = {}
 
-        props['form_options']['csrf_token'] = get_csrf_token()
+        csrf_token = get_csrf_token()
+        if csrf_placeholder is None:
+            csrf_placeholder = current_app.config.get('REACT_RENDER_CSRF_PLACEHOLDER', False)
+        props['form_options']['csrf_token'] = CSRF_TOKEN_PLACEHOLDER if csrf_placeholder else csrf_token
 
         # Add default options.
         opts = props.get('options', {})
@@ -79,18 +291,146 @@ class RenderServer(object):
             'options': opts
         })
 
-        serialized_props = json.dumps(dict(props), cls=JSONEncoder, sort_keys=True)
+        serialized_props = dumps_props(dict(props), current_app.config.get('REACT_RENDER_JSON_BACKEND', 'json'))
 
-        if not current_app.config.get('REACT_RENDER', ''):
-            return RenderedComponent('', serialized_props)
+        if csrf_placeholder:
+            props['form_options']['csrf_token'] = csrf_token
+            return serialized_props, csrf_token
+        return serialized_props, None
 
-        options = {
-            'path': path,
-            'serializedProps': serialized_props,
-            'toStaticMarkup': to_static_markup
+    def render(self, path, props=None, to_static_markup=False, request_headers=None):
+        if to_static_markup:
+            component = self._prerendered(path, props)
+            if component is not None:
+                return component
+
+        start = monotonic()
+        serialized_props, csrf_token = self.serialize_props(props)
+        serialization_time = monotonic() - start
+
+        component = self._render_instrumented(
+            self.url, path, serialized_props, to_static_markup, request_headers, start, serialization_time
+        )
+        if csrf_token is not None:
+            return component.with_csrf_token(csrf_token)
+        return component
+
+    def render_many(self, components, to_static_markup=False, request_headers=None):
+        """
+            Render a list of (path, props) pairs concurrently, returning a RenderedComponent for each in order.
+
+            A component that fails to render doesn't fail the others: it's returned with empty markup, so it can be
+            rendered client side, and the exception in its `error` attribute.
+        """
+        url = self.url
+        app = current_app._get_current_object()
+
+        results = [None] * len(components)
+        serialized = []
+        for i, (path, props) in enumerate(components):
+            if to_static_markup:
+                results[i] = self._prerendered(path, props)
+                if results[i] is not None:
+                    continue
+
+            start = monotonic()
+            serialized_props, csrf_token = self.serialize_props(props)
+            serialized.append((i, path, serialized_props, csrf_token, start, monotonic() - start))
+
+        def render_one(path, serialized_props, start, serialization_time):
+            with app.app_context():
+                return self._render_instrumented(
+                    url, path, serialized_props, to_static_markup, request_headers, start, serialization_time
+                )
+
+        if len(serialized) > 1 and current_app.config.get('REACT_RENDER', ''):
+            executor = self.executor
+            futures = [
+                executor.submit(render_one, path, serialized_props, start, serialization_time)
+                for _, path, serialized_props, _, start, serialization_time in serialized
+            ]
+        else:
+            futures = None
+
+        for n, (i, path, serialized_props, csrf_token, start, serialization_time) in enumerate(serialized):
+            try:
+                if futures is not None:
+                    component = futures[n].result()
+                else:
+                    component = self._render_instrumented(
+                        url, path, serialized_props, to_static_markup, request_headers, start, serialization_time
+                    )
+            except (RenderServerError, ReactRenderingError) as e:
+                component = RenderedComponent('', serialized_props, error=e)
+
+            if csrf_token is not None:
+                component = component.with_csrf_token(csrf_token)
+            results[i] = component
+
+        return results
+
+    def _prerendered(self, path, props):
+        """
+            The prerendered component for `path` and `props`, if there is one.
+
+            Only the markup is prerendered. The props are serialized for this request, so the client side render gets
+            this request's location and config.
+        """
+        prerendered = self.prerendered
+        if prerendered is None:
+            return None
+
+        start = monotonic()
+        entry = prerendered.get(path, props)
+        if entry is None:
+            return None
+
+        serialized_props, csrf_token = self.serialize_props(props, csrf_placeholder=False)
+        serialization_time = monotonic() - start
+
+        bundles = bundle_index.get(entry.files, current_app.config.get('REACT_BUNDLE_URL', '/'))
+        component = RenderedComponent(
+            entry.markup, serialized_props, entry.slug, bundles, stats={'status': 'prerendered'}
+        )
+        self._instrument(path, start, serialization_time, component)
+        return component.with_csrf_token(get_csrf_token())
+
+    def _render_instrumented(self, url, path, serialized_props, to_static_markup, request_headers, start,
+                             serialization_time):
+        try:
+            component = self._render(url, path, serialized_props, to_static_markup, request_headers)
+        except Exception as e:
+            self._instrument(path, start, serialization_time, error=e)
+            raise
+
+        self._instrument(path, start, serialization_time, component)
+        return component
+
+    def _instrument(self, path, start, serialization_time, component=None, error=None):
+        """Record a component render in the metrics and send `component_rendered`"""
+        stats = {
+            'time': monotonic() - start,
+            'serialization_time': serialization_time,
+            'request_bytes': None,
+            'response_bytes': None,
+            'status': 'error',
+            'error': type(error).__name__ if error is not None else None,
         }
-        serialized_options = json.dumps(options, sort_keys=True)
-        options_hash = hashlib.sha1(serialized_options.encode('utf-8')).hexdigest()
+        if component is not None:
+            stats['status'] = component.stats.get('status', 'rendered')
+            stats['request_bytes'] = component.stats.get('request_bytes')
+            stats['response_bytes'] = component.stats.get('response_bytes')
+
+        self.metrics.record(path, stats)
+        component_rendered.send(self, path=path, stats=stats)
+
+    def _render(self, url, path, serialized_props, to_static_markup, request_headers):
+        if not current_app.config.get('REACT_RENDER', ''):
+            return RenderedComponent('', serialized_props, stats={'status': 'disabled'})
+
+        serialized_options, options_hash = serialize_options(
+            path, serialized_props, to_static_markup, current_app.config.get('REACT_RENDER_INLINE_PROPS', False)
+        )
 
         all_request_headers = {'content-type': 'application/json'}
 
@@ -98,20 +438,99 @@ class RenderServer(object):
         if request_headers is not None:
             all_request_headers.update(request_headers)
 
-        try:
-            res = requests.post(
-                url,
-                data=serialized_options,
-                headers=all_request_headers,
-                params={'hash': options_hash}
-            )
-        except requests.exceptions.ConnectionError:
-            raise RenderServerError('Could not connect to render server at {}'.format(url))
+        # The render server may render differently for different request headers (e.g. for another user), so renders
+        # are only cached and coalesced with identical renders sent to the same servers with the same headers
+        key = (tuple(endpoint_urls(url)), options_hash, tuple(sorted(all_request_headers.items())))
+
+        cache = self.cache
+        if cache is not None:
+            cached, stale = cache.lookup(key)
+            if cached is not None:
+                if stale:
+                    self.refresher.refresh(
+                        key, self._refresh, current_app._get_current_object(),
+                        key, url, serialized_options, options_hash, all_request_headers
+                    )
+                markup, slug, bundles = cached
+                return RenderedComponent(
+                    markup, serialized_props, slug, bundles, stats={'status': 'stale' if stale else 'cached'}
+                )
 
-        if res.status_code != 200:
-            raise RenderServerError(
-                'Unexpected response from render server at {} - {}: {}'.format(url, res.status_code, res.text)
+        breaker = self.breaker
+        if breaker is not None and not breaker.allow_request():
+            # Render server is failing - let the browser render the component instead
+            return RenderedComponent('', serialized_props, stats={'status': 'fallback'})
+
+        if current_app.config.get('REACT_RENDER_COALESCE', False):
+            # Identical renders already in flight share a single request to the render server
+            markup, slug, files, stats = self.in_flight.do(
+                key, self._fetch, url, serialized_options, options_hash, all_request_headers, breaker
             )
+        else:
+            markup, slug, files, stats = self._fetch(
+                url, serialized_options, options_hash, all_request_headers, breaker
+            )
+
+        bundles = bundle_index.get(files, current_app.config.get('REACT_BUNDLE_URL', '/'))
+        if cache is not None:
+            self._cache_render(cache, key, markup, slug, bundles)
+
+        return RenderedComponent(markup, serialized_props, slug, bundles, stats=stats)
+
+    def _cache_render(self, cache, key, markup, slug, bundles):
+        size = len(markup) + len(slug) + sum(len(key) + len(value) for key, value in bundles.files.items())
+        cache.set(key, (markup, slug, bundles), size)
+
+    def _refresh(self, app, key, url, serialized_options, options_hash, request_headers):
+        """Re-render a stale cache entry, outside of any request"""
+        with app.app_context():
+            breaker = self.breaker
+            if breaker is not None and not breaker.allow_request():
+                return
+
+            try:
+                markup, slug, files, _ = self._fetch(url, serialized_options, options_hash, request_headers, breaker)
+            except (RenderServerError, ReactRenderingError) as e:
+                current_app.logger.warning(
+                    'Failed to refresh cached render {options_hash}: {error}',
+                    extra={'options_hash': options_hash, 'error': e}
+                )
+                return
+
+            bundles = bundle_index.get(files, current_app.config.get('REACT_BUNDLE_URL', '/'))
+            self._cache_render(self.cache, key, markup, slug, bundles)
+
+    def _fetch(self, url, serialized_options, options_hash, request_headers, breaker=None):
+        stats = {'status': 'rendered', 'request_bytes': len(serialized_options)}
+
+        config = current_app.config
+        compress = config.get('REACT_RENDER_COMPRESS', False)
+        if compress and len(serialized_options) >= int(config.get('REACT_RENDER_COMPRESS_MIN_BYTES', 16 * 1024)):
+            compress_start = monotonic()
+            serialized_options = gzip_compress(serialized_options, int(config.get('REACT_RENDER_COMPRESS_LEVEL', 6)))
+            stats['compression_time'] = monotonic() - compress_start
+            stats['request_compressed_bytes'] = len(serialized_options)
+            stats['request_compression_ratio'] = float(len(serialized_options)) / stats['request_bytes']
+
+            request_headers = dict(request_headers)
+            request_headers['content-encoding'] = 'gzip'
+
+        start = monotonic()
+        try:
+            res = self._post(url, serialized_options, options_hash, request_headers)
+        except Exception:
+            # Any failure has to be recorded, or a half open breaker would wait for its trial render forever
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+
+        if breaker is not None:
+            breaker.record_success(monotonic() - start)
+
+        stats['response_bytes'] = len(res.content)
+        if res.headers.get('content-encoding') == 'gzip' and 'content-length' in res.headers:
+            stats['response_compressed_bytes'] = int(res.headers['content-length'])
+            stats['response_compression_ratio'] = float(stats['response_compressed_bytes']) / stats['response_bytes']
 
         obj = res.json()
 
@@ -130,7 +549,107 @@ class RenderServer(object):
         if markup is None:
             raise ReactRenderingError('Render server failed to return markup. Returned: {}'.format(obj))
 
-        return RenderedComponent(markup, serialized_props, slug, files)
+        return markup, slug, files, stats
+
+    def _post(self, url, serialized_options, options_hash, request_headers):
+        send = partial(self._send, self.transport, self.timeout, serialized_options, options_hash, request_headers)
+
+        urls = endpoint_urls(url)
+        if len(urls) == 1:
+            return send(urls[0])
+
+        config = current_app.config
+        balancer = self.balancer(urls)
+        if config.get('REACT_RENDER_HEDGE', False):
+            delay = balancer.latency_percentile(
+                float(config.get('REACT_RENDER_HEDGE_PERCENTILE', 95)),
+                int(config.get('REACT_RENDER_HEDGE_MIN_SAMPLES', 20)),
+            )
+            if delay is not None:
+                return self._send_hedged(balancer, send, delay)
+
+        return self._send_to_endpoint(balancer, balancer.acquire(), send)
+
+    def _send_hedged(self, balancer, send, delay):
+        """
+            Send to one endpoint and, if it hasn't answered within `delay` seconds of being sent, to a second one as
+            well. Returns whichever response arrives first, or raises if both fail.
+
+            Both requests are sent from the hedge pool, so the first can be given up on. Requests never wait for a
+            worker: with none free the first request is sent from this thread without a hedge, and a hedge is only
+            sent if there's a worker free for it.
+        """
+        executor = self.hedge_executor
+        slots = self._hedge_slots
+        first = balancer.acquire()
+        if not slots.acquire(False):
+            return self._send_to_endpoint(balancer, first, send)
+
+        started = threading.Event()
+        futures = [executor.submit(self._send_from_pool, slots, started, balancer, first, send)]
+
+        started.wait()
+        done, _ = wait(futures, timeout=delay)
+        if not done and slots.acquire(False):
+            second = balancer.acquire(exclude=first)
+            if second is None:
+                slots.release()
+            else:
+                balancer.record_hedge()
+                futures.append(executor.submit(self._send_from_pool, slots, None, balancer, second, send))
+
+        error = None
+        pending = futures
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        raise error
+
+    def _send_from_pool(self, slots, started, balancer, endpoint, send):
+        try:
+            if started is not None:
+                started.set()
+            return self._send_to_endpoint(balancer, endpoint, send)
+        finally:
+            slots.release()
+
+    def _send_to_endpoint(self, balancer, endpoint, send):
+        start = monotonic()
+        try:
+            res = send(endpoint.url)
+        except Exception:
+            balancer.release(endpoint, failed=True)
+            raise
+
+        balancer.release(endpoint, monotonic() - start)
+        return res
+
+    def _send(self, transport, timeout, serialized_options, options_hash, request_headers, url):
+        try:
+            res = transport.post(
+                url,
+                data=serialized_options,
+                headers=request_headers,
+                params={'hash': options_hash},
+                timeout=timeout
+            )
+        except requests.exceptions.Timeout:
+            raise RenderServerError('Timed out waiting for render server at {}'.format(url))
+        except requests.exceptions.ConnectionError:
+            raise RenderServerError('Could not connect to render server at {}'.format(url))
+        except requests.exceptions.RequestException as e:
+            raise RenderServerError('Request to render server at {} failed: {}'.format(url, e))
+
+        if res.status_code != 200:
+            raise RenderServerError(
+                'Unexpected response from render server at {} - {}: {}'.format(url, res.status_code, res.text)
+            )
+
+        return res
 
 
 render_server = RenderServer()
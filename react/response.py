@@ -1,37 +1,325 @@
+import re
+
+from six import string_types
+from werkzeug.exceptions import BadRequest
+
+# A form field name is made of names separated by dots, `[n]` list indexes and `[]` list markers
+_KEY_TOKEN = re.compile(r'\[(\d*)\]|([^.\[\]]+)')
+
+# Largest list index accepted in a form field name, so a single field can't make a huge list
+MAX_LIST_INDEX = 10000
+
+_parsed_keys = {}
+_MAX_PARSED_KEYS = 10000
+
+
+def parse_key(raw_key):
+    """
+        Split a form field name into its path, and whether it's a list field.
+
+        `a.b[0].c[]` gives `(('a', 'b', 0, 'c'), True)`. A field is a list of all its values if its name has a `[]`
+        marker, otherwise it's a single value if it was only sent once.
+    """
+    parsed = _parsed_keys.get(raw_key)
+    if parsed is None:
+        path = []
+        is_list = False
+        for index, name in _KEY_TOKEN.findall(raw_key):
+            if name:
+                path.append(name)
+            elif index:
+                path.append(int(index))
+            else:
+                is_list = True
+
+        parsed = (tuple(path), is_list)
+        # Forms send the same field names over and over, but don't let arbitrary names fill up memory
+        if len(_parsed_keys) < _MAX_PARSED_KEYS:
+            _parsed_keys[raw_key] = parsed
+    return parsed
+
+
+def _get(node, token):
+    if isinstance(node, list):
+        return node[token] if token < len(node) else None
+    return node.get(token)
+
+
+def _set(node, token, value):
+    if isinstance(node, list):
+        if token >= len(node):
+            if token > MAX_LIST_INDEX:
+                raise BadRequest('Form field index {} is too large'.format(token))
+            node.extend([None] * (token + 1 - len(node)))
+    node[token] = value
+
+
 def from_response(request):
     if request.content_type == 'application/json':
         return request.get_json()
 
     result = {}
-    for raw_key in request.form.keys():
-        value = request.form.getlist(raw_key)
-        key = raw_key.replace('[]', '')
+    for raw_key, value in request.form.lists():
+        path, is_list = parse_key(raw_key)
+        if not path:
+            continue
+
         # single value as string/int
-        if len(value) == 1 and '[]' not in raw_key:
+        if len(value) == 1 and not is_list:
             value = value[0].strip()
-        if '.' not in key:
-            result[key] = value
-        else:
-            parent_name = key.split('.')[0]
-            child_name = key.split('.')[1]
-            if parent_name not in result:
-                result[parent_name] = {}
-            result[parent_name][child_name] = value
+
+        # Walk down the path, making the lists and dicts it goes through. A field that clashes with an earlier one
+        # (like `a.b` after `a`) replaces it.
+        node = result
+        for token, next_token in zip(path, path[1:]):
+            child = _get(node, token)
+            container = list if isinstance(next_token, int) else dict
+            if not isinstance(child, container):
+                child = container()
+                _set(node, token, child)
+            node = child
+        _set(node, path[-1], value)
+
     if result.get('csrf_token'):
         del result['csrf_token']
     return result
 
 
+_required_field_schemas = {}
+_MAX_REQUIRED_FIELD_SCHEMAS = 1000
+
+
 def validate_form_data(data, required_fields):
-    errors = {}
-    for field in required_fields:
-        name = field[0] if isinstance(field, tuple) else field
-        if not data.get(name, None) or not data.get(name)[0]:
-            errors[name] = {"required": True}
-            continue
+    """
+        Check `required_fields` are filled in. `required_fields` is a list of field names, or (name, min length) tuples.
+
+        The FormSchema for each list of fields is made once and reused.
+    """
+    key = tuple(required_fields)
+    schema = _required_field_schemas.get(key)
+    if schema is None:
+        schema = FormSchema.from_required_fields(key)
+        # Callers pass the same few lists over and over, but don't let lists made on the fly fill up memory
+        if len(_required_field_schemas) < _MAX_REQUIRED_FIELD_SCHEMAS:
+            _required_field_schemas[key] = schema
+    return schema.validate(data)
+
+
+class Field(object):
+    """
+        A field in a FormSchema.
+
+        `name` is the field's path in the decoded form, in the same syntax as form field names: `a.b`, `a[0].b`, or
+        `a[].b` to check `b` in every item of the list `a`.
+    """
+
+    def __init__(self, name, required=False, min_length=None, max_length=None, pattern=None):
+        self.name = name
+        self.required = required
+        self.min_length = min_length
+        self.max_length = max_length
+        self.pattern = pattern
+
+
+_EACH = object()
+
+# Values min and max lengths apply to
+_SIZED = string_types + (list, tuple)
+
+
+def _compile_path(name):
+    path = []
+    for index, key in _KEY_TOKEN.findall(name):
+        if key:
+            path.append(key)
+        elif index:
+            path.append(int(index))
+        else:
+            path.append(_EACH)
+    return tuple(path)
+
+
+def _format_path(path):
+    name = ''
+    for token in path:
+        if isinstance(token, int):
+            name += '[{}]'.format(token)
+        else:
+            name += '.' + token if name else token
+    return name
+
+
+def _follow(data, path):
+    value = data
+    for token in path:
+        if isinstance(value, dict):
+            value = value.get(token)
+        elif isinstance(value, list) and isinstance(token, int) and token < len(value):
+            value = value[token]
+        else:
+            return None
+    return value
+
+
+def _resolve(data, path):
+    """(path, value) of each value `path` leads to, with `[]` expanded to every list item"""
+    nodes = [((), data)]
+    for token in path:
+        next_nodes = []
+        for node_path, node in nodes:
+            if token is _EACH:
+                if isinstance(node, list):
+                    next_nodes.extend((node_path + (i,), item) for i, item in enumerate(node))
+            else:
+                next_nodes.append((node_path + (token,), _follow(node, (token,))))
+        nodes = next_nodes
+    return nodes
+
+
+def _check_value(errors, name, value, required, check):
+    # A list's first item has to be filled in too
+    if not value or (isinstance(value, (list, tuple)) and not value[0]):
+        if required:
+            errors[name] = {'required': True}
+    elif check is not None:
+        field_errors = check(value)
+        if field_errors:
+            errors[name] = field_errors
+
+
+def _compile_checks(field):
+    """
+        A function returning the min, max and pattern errors for a filled in value (or None if it has none), or None if
+        the field has nothing to check.
+    """
+    min_length = field.min_length
+    max_length = field.max_length
+    pattern = re.compile(r'(?:{})\Z'.format(field.pattern)) if field.pattern is not None else None
+    if min_length is None and max_length is None and pattern is None:
+        return None
+
+    def check(value):
+        errors = None
+        if isinstance(value, _SIZED):
+            length = len(value)
+            if min_length is not None and length < min_length:
+                errors = {'min': True}
+            if max_length is not None and length > max_length:
+                errors = errors or {}
+                errors['max'] = True
+
+        if pattern is not None:
+            items = value if isinstance(value, (list, tuple)) else (value,)
+            if not all(isinstance(item, string_types) and pattern.match(item) for item in items):
+                errors = errors or {}
+                errors['pattern'] = True
+        return errors
+
+    return check
+
+
+class FormSchema(object):
+    """
+        Validates decoded forms (as returned by `from_response`) against a list of Fields.
+
+        Each field's path and checks are worked out once, when the schema is made, so a schema is best made at import
+        time and reused. Validating returns a dict of every field with errors, by path, with the checks it failed:
+
+            {'contact.email': {'required': True}, 'items[1].name': {'min': True, 'pattern': True}}
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self._validators = []
+
+        # Runs of top level fields with only required and min length checks, the most common kind, are checked in a
+        # single loop rather than a function call each
+        simple_fields = []
+        for field in self.fields:
+            if self._is_simple(field):
+                simple_fields.append((field.name, field.min_length))
+                continue
+
+            if simple_fields:
+                self._validators.append(self._compile_simple_fields(simple_fields))
+                simple_fields = []
+            validator = self._compile_field(field)
+            if validator is not None:
+                self._validators.append(validator)
+
+        if simple_fields:
+            self._validators.append(self._compile_simple_fields(simple_fields))
+
+    @classmethod
+    def from_required_fields(cls, required_fields):
+        """Schema for the `required_fields` list `validate_form_data` takes: names, or (name, min length) tuples"""
+        return cls([
+            Field(field[0], required=True, min_length=field[1]) if isinstance(field, tuple)
+            else Field(field, required=True)
+            for field in required_fields
+        ])
+
+    @staticmethod
+    def _is_simple(field):
+        return (
+            field.required and field.max_length is None and field.pattern is None and
+            _compile_path(field.name) == (field.name,)
+        )
+
+    @staticmethod
+    def _compile_simple_fields(simple_fields):
+        """A function checking the required (name, min length) fields `simple_fields`, inlining _check_value"""
+        simple_fields = tuple(simple_fields)
+        sequence_types = (list, tuple)
+
+        def validate_fields(data, errors):
+            for name, min_length in simple_fields:
+                value = data.get(name)
+                if not value or (isinstance(value, sequence_types) and not value[0]):
+                    errors[name] = {'required': True}
+                elif min_length is not None and isinstance(value, _SIZED) and len(value) < min_length:
+                    errors[name] = {'min': True}
+
+        return validate_fields
+
+    @staticmethod
+    def _compile_field(field):
+        """A function adding the errors of `field` in a form to a dict of errors, or None if it has nothing to check"""
+        path = _compile_path(field.name)
+        required = field.required
+        check = _compile_checks(field)
+        if not path or not (required or check):
+            return None
+
+        if _EACH in path:
+            def validate_field(data, errors):
+                for value_path, value in _resolve(data, path):
+                    _check_value(errors, _format_path(value_path), value, required, check)
+        elif len(path) == 1:
+            # Most fields are top level, and can be looked up without following a path
+            key = path[0]
+            name = _format_path(path)
+
+            def validate_field(data, errors):
+                _check_value(errors, name, data.get(key), required, check)
+        else:
+            name = _format_path(path)
+
+            def validate_field(data, errors):
+                _check_value(errors, name, _follow(data, path), required, check)
+
+        return validate_field
+
+    def validate(self, data):
+        if not isinstance(data, dict):
+            data = {}
 
-        length = field[1] if isinstance(field, tuple) else None
-        if length and len(data.get(name)) < length:
-            errors[name] = {"min": True}
+        errors = {}
+        for validate_field in self._validators:
+            validate_field(data, errors)
+        return errors
 
-    return errors
+    def validate_many(self, payloads):
+        """Validate a list of payloads, returning a list of their errors in the same order"""
+        validate = self.validate
+        return [validate(data) for data in payloads]
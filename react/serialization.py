@@ -0,0 +1,70 @@
+import hashlib
+import json
+import zlib
+from json.encoder import encode_basestring_ascii
+
+from flask.json import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_encoder = JSONEncoder()
+
+if orjson is not None:
+    # Datetimes are passed through to the flask encoder, so they're serialized the same way with either backend.
+    ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps_props(props, backend='json'):
+    """
+        Serialize component props to a JSON string, with sorted keys.
+
+        Uses the stdlib encoder, or orjson if `backend` is 'auto' and it's installed. The two produce equivalent JSON
+        but orjson doesn't add whitespace between items or escape non-ASCII characters, so the props embedded in pages
+        change. U+2028 and U+2029 are still escaped, as browsers before ES2019 don't allow them in inline scripts.
+    """
+    if backend == 'auto' and orjson is not None:
+        serialized = orjson.dumps(props, default=_json_encoder.default, option=ORJSON_OPTIONS).decode('utf-8')
+        return serialized.replace(u'\u2028', u'\\u2028').replace(u'\u2029', u'\\u2029')
+
+    return json.dumps(props, cls=JSONEncoder, sort_keys=True)
+
+
+def serialize_options(path, serialized_props, to_static_markup, inline_props=False):
+    """
+        Build the render server request body around already serialized props.
+
+        Returns the body as bytes, and a SHA1 hash of it computed over the same pieces the body is joined from.
+
+        By default the props are embedded as the `serializedProps` string, producing exactly the body
+        `json.dumps(options, sort_keys=True)` would. With `inline_props` they're embedded as-is as a `props` object
+        instead, which saves escaping them a second time but needs a render server that reads `props`.
+    """
+    if inline_props:
+        props_key = b', "props": '
+        props = serialized_props.encode('utf-8')
+    else:
+        props_key = b', "serializedProps": '
+        props = encode_basestring_ascii(serialized_props).encode('ascii')
+
+    pieces = [
+        b'{"path": ',
+        encode_basestring_ascii(path).encode('ascii'),
+        props_key,
+        props,
+        b', "toStaticMarkup": true}' if to_static_markup else b', "toStaticMarkup": false}',
+    ]
+
+    options_hash = hashlib.sha1()
+    for piece in pieces:
+        options_hash.update(piece)
+
+    return b''.join(pieces), options_hash.hexdigest()
+
+
+def gzip_compress(data, level=6):
+    # zlib with a gzip header, as gzip.compress isn't available on python 2
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
@@ -0,0 +1,9 @@
+from blinker import Namespace
+
+signals = Namespace()
+
+# Sent by a CircuitBreaker with `old_state` and `new_state` keyword arguments.
+breaker_state_changed = signals.signal('react-render-breaker-state-changed')
+
+# Sent by a RenderServer after each component render, with the component `path` and a dict of render `stats`.
+component_rendered = signals.signal('react-component-rendered')
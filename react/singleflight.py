@@ -0,0 +1,65 @@
+import sys
+import threading
+
+import six
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """
+        Coalesces concurrent calls that share a key into a single call.
+
+        The first caller for a key runs the function. Callers that arrive with the same key while it's running wait
+        for it to finish and get its result, or have its exception raised.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.exc_info is not None:
+                six.reraise(*call.exc_info)
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException:
+            # Including interruptions like gevent's Timeout, so waiting callers don't take None as the result
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+            }
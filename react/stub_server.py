@@ -0,0 +1,132 @@
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+from six.moves import BaseHTTPServer, socketserver
+
+
+class StubRenderHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between renders, like the node render server.
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        if self.headers.get('content-encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+
+        server = self.server
+        delay = server.delay
+        if server.jitter:
+            delay += server.random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+        options = json.loads(body.decode('utf-8'))
+
+        status = 200
+        if server.error_rate and server.random.random() < server.error_rate:
+            if server.error_kind == 'render':
+                response = {'error': {'message': 'Stub render error', 'stack': 'at stub_server'}}
+            else:
+                status = 500
+                response = {'error': 'Stub server error'}
+        else:
+            markup = '<div data-path="{}">'.format(options.get('path', ''))
+            response = {
+                'markup': markup + 'x' * max(server.markup_size - len(markup) - 6, 0) + '</div>',
+                'slug': 'main',
+                'files': {'main': 'main.js', 'vendor': 'vendor.js'},
+            }
+        response = json.dumps(response).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixStubRenderHandler(StubRenderHandler):
+    # TCP_NODELAY isn't supported on unix domain sockets
+    disable_nagle_algorithm = False
+
+    def address_string(self):
+        return self.server.server_address
+
+
+class ThreadedHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class ThreadedUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class StubRenderServer(object):
+    """
+        A stand-in for the node render server, for tests and benchmarks.
+
+        Speaks the same JSON protocol as the real render server and answers every render with a fixed bit of markup,
+        padded out to `markup_size` characters. Listens on a unix domain socket instead of TCP if `unix_socket` is
+        given.
+
+        Each render takes `delay` seconds, plus a random extra of up to `jitter` seconds. A random `error_rate` share of
+        renders fail: with a 500 response if `error_kind` is 'http', or with a rendering error if it's 'render'. Pass
+        a `seed` to make the jitter and errors repeatable.
+
+        Usage:
+
+            with StubRenderServer() as server:
+                app.config['REACT_RENDER_URL'] = server.url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, unix_socket=None, delay=0, jitter=0, error_rate=0,
+                 error_kind='http', markup_size=0, seed=None):
+        if error_kind not in ('http', 'render'):
+            raise ValueError("error_kind must be 'http' or 'render'")
+
+        self.unix_socket = unix_socket
+        if unix_socket:
+            self.httpd = ThreadedUnixHTTPServer(unix_socket, UnixStubRenderHandler)
+        else:
+            self.httpd = ThreadedHTTPServer((host, port), StubRenderHandler)
+        self.httpd.delay = delay
+        self.httpd.jitter = jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.error_kind = error_kind
+        self.httpd.markup_size = markup_size
+        self.httpd.random = random.Random(seed)
+        self.thread = None
+
+    @property
+    def url(self):
+        if self.unix_socket:
+            return 'unix://{}:/render'.format(self.unix_socket)
+
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}/render'.format(host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+        if self.unix_socket:
+            os.remove(self.unix_socket)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,154 @@
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from six.moves.urllib.parse import quote, unquote, urlparse
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+
+UNIX_SOCKET_SCHEME = 'unix://'
+
+
+def request_url(url):
+    """
+        Turn a render server URL into one requests can send to.
+
+        `unix:///path/to.sock` URLs, optionally followed by the request path (eg. `unix:///path/to.sock:/render`), are
+        sent over a unix domain socket. Other URLs are returned unchanged.
+    """
+    if not url.startswith(UNIX_SOCKET_SCHEME):
+        return url
+
+    socket_path, _, path = url[len(UNIX_SOCKET_SCHEME):].partition(':')
+    return 'http+unix://{}{}'.format(quote(socket_path, safe=''), path or '/')
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        self.socket_path = kwargs.pop('socket_path')
+        super(UnixHTTPConnection, self).__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # urllib3 uses a sentinel object for "no timeout set"
+        if self.timeout is None or isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+
+        try:
+            sock.connect(self.socket_path)
+        except socket.error as e:
+            sock.close()
+            raise NewConnectionError(self, 'Failed to connect to {}: {}'.format(self.socket_path, e))
+
+        return sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = UnixHTTPConnection
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """Sends `http+unix://` requests over a pool of connections to the unix domain socket named in the host"""
+
+    def __init__(self, *args, **kwargs):
+        self._unix_pools = {}
+        self._unix_pools_lock = threading.Lock()
+        super(UnixSocketAdapter, self).__init__(*args, **kwargs)
+
+    def get_connection(self, url, proxies=None):
+        socket_path = unquote(urlparse(url).netloc)
+
+        pool = self._unix_pools.get(socket_path)
+        if pool is None:
+            with self._unix_pools_lock:
+                pool = self._unix_pools.get(socket_path)
+                if pool is None:
+                    pool = UnixHTTPConnectionPool(
+                        'localhost',
+                        maxsize=self._pool_maxsize,
+                        block=self._pool_block,
+                        socket_path=socket_path,
+                    )
+                    self._unix_pools[socket_path] = pool
+        return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        # Used instead of get_connection from requests 2.32
+        return self.get_connection(request.url, proxies)
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def close(self):
+        super(UnixSocketAdapter, self).close()
+        with self._unix_pools_lock:
+            for pool in self._unix_pools.values():
+                pool.close()
+            self._unix_pools.clear()
+
+
+class RenderTransport(object):
+    """
+        A pooled HTTP session for talking to the render server.
+
+        Connections are kept alive between renders, so each server-side render doesn't pay for a new TCP (and TLS)
+        handshake. The underlying urllib3 pool is thread-safe, so one transport is shared by every request thread in
+        the process.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, retries=0, backoff_factor=0):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+
+        # Only retry failed connection attempts - a render that reached the server may not be safe to send twice.
+        max_retries = Retry(total=retries, connect=retries, read=False, status=0, backoff_factor=backoff_factor)
+
+        self.session = requests.Session()
+        self.mount(HTTPAdapter(pool_maxsize=pool_size, max_retries=max_retries))
+        self.session.mount('http+unix://', UnixSocketAdapter(pool_maxsize=pool_size, max_retries=max_retries))
+
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def mount(self, adapter):
+        for prefix in ('http://', 'https://'):
+            self.session.mount(prefix, adapter)
+
+    def post(self, url, data, headers=None, params=None, timeout=None):
+        return self.session.post(request_url(url), data=data, headers=headers, params=params, timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class TransportPool(object):
+    """
+        Process-wide registry of render transports, keyed by their settings.
+
+        Apps normally have one set of settings, so this holds a single transport for the life of the process. A
+        new transport is only built if the config changes (eg. between test cases).
+    """
+
+    def __init__(self):
+        self._transports = {}
+        self._lock = threading.Lock()
+
+    def get(self, pool_size=10, keep_alive=True, retries=0, backoff_factor=0):
+        key = (pool_size, keep_alive, retries, backoff_factor)
+        transport = self._transports.get(key)
+        if transport is None:
+            with self._lock:
+                transport = self._transports.get(key)
+                if transport is None:
+                    transport = RenderTransport(pool_size, keep_alive, retries, backoff_factor)
+                    self._transports[key] = transport
+        return transport
+
+    def close(self):
+        with self._lock:
+            for transport in self._transports.values():
+                transport.close()
+            self._transports.clear()
@@ -27,6 +27,7 @@ setup(
         'inflection',
         'flask-cache',
         'flask_featureflags',
+        'futures; python_version < "3"',
         'flask-login',
         'flask-script',
         'monotonic',
@@ -1,19 +1,30 @@
 # coding=utf-8
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
 import mock
+import pytest
+
+from dmutils.asset_fingerprint import AssetFingerprinter, build_manifest, hash_asset_file, write_manifest
+
+from .helpers import BaseApplicationTest
+
 
-from dmutils.asset_fingerprint import AssetFingerprinter
+def file_contents(contents):
+    return lambda *args: io.BytesIO(contents.encode('utf-8'))
 
 
-@mock.patch(
-    'dmutils.asset_fingerprint.AssetFingerprinter.get_asset_file_contents'
-)
+@mock.patch('dmutils.asset_fingerprint.open', create=True)
 class TestAssetFingerprint(object):
-    def test_url_format(self, get_file_content_mock):
-        get_file_content_mock.return_value = """
+    def test_url_format(self, open_mock):
+        open_mock.side_effect = file_contents("""
             body {
                 font-family: nta;
             }
-        """
+        """)
         asset_fingerprinter = AssetFingerprinter(
             asset_root='/suppliers/static/'
         )
@@ -26,22 +37,22 @@ class TestAssetFingerprint(object):
             '/suppliers/static/application-ie6.css?418e6f4a6cdf1142e45c072ed3e1c90a'  # noqa
         )
 
-    def test_building_file_path(self, get_file_content_mock):
-        get_file_content_mock.return_value = """
+    def test_building_file_path(self, open_mock):
+        open_mock.side_effect = file_contents("""
             document.write('Hello world!');
-        """
+        """)
         fingerprinter = AssetFingerprinter()
         fingerprinter.get_url('javascripts/application.js')
-        fingerprinter.get_asset_file_contents.assert_called_with(
-            'app/static/javascripts/application.js'
+        open_mock.assert_called_with(
+            'app/static/javascripts/application.js', 'rb'
         )
 
-    def test_hashes_are_consistent(self, get_file_content_mock):
-        get_file_content_mock.return_value = """
+    def test_hashes_are_consistent(self, open_mock):
+        open_mock.side_effect = file_contents("""
             body {
                 font-family: nta;
             }
-        """
+        """)
         asset_fingerprinter = AssetFingerprinter()
         assert (
             asset_fingerprinter.get_asset_fingerprint('application.css') ==
@@ -49,29 +60,29 @@ class TestAssetFingerprint(object):
         )
 
     def test_hashes_are_different_for_different_files(
-        self, get_file_content_mock
+        self, open_mock
     ):
         asset_fingerprinter = AssetFingerprinter()
-        get_file_content_mock.return_value = """
+        open_mock.side_effect = file_contents("""
             body {
                 font-family: nta;
             }
-        """
+        """)
         css_hash = asset_fingerprinter.get_asset_fingerprint('application.css')
-        get_file_content_mock.return_value = """
+        open_mock.side_effect = file_contents("""
             document.write('Hello world!');
-        """
+        """)
         js_hash = asset_fingerprinter.get_asset_fingerprint('application.js')
         assert (
             js_hash != css_hash
         )
 
-    def test_hash_gets_cached(self, get_file_content_mock):
-        get_file_content_mock.return_value = """
+    def test_hash_gets_cached(self, open_mock):
+        open_mock.side_effect = file_contents("""
             body {
                 font-family: nta;
             }
-        """
+        """)
         fingerprinter = AssetFingerprinter()
         assert (
             fingerprinter.get_url('application.css') ==
@@ -84,8 +95,8 @@ class TestAssetFingerprint(object):
             fingerprinter.get_url('application.css') ==
             'a1a1a1'
         )
-        fingerprinter.get_asset_file_contents.assert_called_once_with(
-            'app/static/application.css'
+        open_mock.assert_called_once_with(
+            'app/static/application.css', 'rb'
         )
 
 
@@ -93,3 +104,109 @@ class TestAssetFingerprintWithUnicode(object):
     def test_can_read_self(self):
         'Ralph’s apostrophe'
         AssetFingerprinter(filesystem_path='tests/').get_url('test_asset_fingerprint.py')
+
+
+class TestAssetFingerprintPreload(object):
+    def setup(self):
+        self.directory = tempfile.mkdtemp() + '/'
+        os.makedirs(os.path.join(self.directory, 'stylesheets'))
+        self.write('stylesheets/application.css', 'body {}')
+        self.write('application.js', 'document.write("Hello world!");')
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, asset_path, contents):
+        with open(self.directory + asset_path, 'w') as f:
+            f.write(contents)
+
+    def test_preload(self):
+        fingerprinter = AssetFingerprinter(filesystem_path=self.directory)
+        assert fingerprinter.preload() == 2
+
+        with mock.patch('dmutils.asset_fingerprint.hash_asset_file') as hash_asset_file:
+            assert fingerprinter.get_url('stylesheets/application.css') == \
+                '/static/stylesheets/application.css?' + hashlib.md5(b'body {}').hexdigest()
+            fingerprinter.get_url('application.js')
+
+        assert not hash_asset_file.called
+
+    def test_changes_are_ignored_without_check_mtime(self):
+        fingerprinter = AssetFingerprinter(filesystem_path=self.directory)
+        url = fingerprinter.get_url('application.js')
+        self.write('application.js', 'changed')
+        os.utime(self.directory + 'application.js', (0, 0))
+
+        assert fingerprinter.get_url('application.js') == url
+
+    def test_check_mtime(self):
+        fingerprinter = AssetFingerprinter(filesystem_path=self.directory, check_mtime=True)
+        url = fingerprinter.get_url('application.js')
+        assert fingerprinter.get_url('application.js') == url
+
+        self.write('application.js', 'changed')
+        os.utime(self.directory + 'application.js', (0, 0))
+
+        assert fingerprinter.get_url('application.js') == \
+            '/static/application.js?' + hashlib.md5(b'changed').hexdigest()
+
+
+class TestAssetManifest(object):
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.static = os.path.join(self.directory, 'static') + '/'
+        os.makedirs(os.path.join(self.static, 'fonts'))
+        self.font = bytes(bytearray(range(256))) * 1000
+        with open(self.static + 'fonts/font.woff', 'wb') as f:
+            f.write(self.font)
+        with open(self.static + 'application.js', 'wb') as f:
+            f.write(b'document.write("Hello world!");')
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hash_binary_file(self):
+        assert hash_asset_file(self.static + 'fonts/font.woff') == hashlib.md5(self.font).hexdigest()
+        assert hash_asset_file(self.static + 'fonts/font.woff', 'sha1') == hashlib.sha1(self.font).hexdigest()
+
+    def test_build_manifest(self):
+        manifest = build_manifest(self.static, processes=2)
+
+        assert manifest == {
+            'digest': 'md5',
+            'assets': {
+                'application.js': hashlib.md5(b'document.write("Hello world!");').hexdigest(),
+                'fonts/font.woff': hashlib.md5(self.font).hexdigest(),
+            }
+        }
+
+    def test_load_manifest(self):
+        manifest_path = os.path.join(self.directory, 'manifest.json')
+        write_manifest(build_manifest(self.static, processes=1), manifest_path)
+
+        fingerprinter = AssetFingerprinter(filesystem_path=self.static)
+        assert fingerprinter.load_manifest(manifest_path) == 2
+
+        with mock.patch('dmutils.asset_fingerprint.hash_asset_file') as hash_asset_file:
+            assert fingerprinter.get_url('fonts/font.woff') == \
+                '/static/fonts/font.woff?' + hashlib.md5(self.font).hexdigest()
+
+        assert not hash_asset_file.called
+
+    def test_manifest_digest_must_match(self):
+        manifest_path = os.path.join(self.directory, 'manifest.json')
+        write_manifest(build_manifest(self.static, digest='sha1', processes=1), manifest_path)
+
+        with pytest.raises(ValueError):
+            AssetFingerprinter(filesystem_path=self.static).load_manifest(manifest_path)
+
+
+class TestFrontendAppFingerprinter(BaseApplicationTest):
+    def test_fingerprinter_is_shared_between_renders(self):
+        with self.flask.test_request_context('/'):
+            first, second = {}, {}
+            self.flask.update_template_context(first)
+            self.flask.update_template_context(second)
+
+        assert first['asset_fingerprinter'] is second['asset_fingerprinter']
+        assert first['asset_fingerprinter'] is self.flask.extensions['asset_fingerprinter']
@@ -0,0 +1,78 @@
+import mock
+
+from react.balancer import EndpointBalancer
+
+
+class TestEndpointBalancer(object):
+    def test_picks_endpoint_with_fewest_outstanding_renders(self):
+        balancer = EndpointBalancer(['a', 'b', 'c'])
+
+        acquired = [balancer.acquire() for _ in range(3)]
+        assert sorted(endpoint.url for endpoint in acquired) == ['a', 'b', 'c']
+
+        balancer.release(acquired[1], 0.1)
+        assert balancer.acquire() is acquired[1]
+
+    def test_exclude(self):
+        balancer = EndpointBalancer(['a', 'b'])
+        first = balancer.acquire()
+
+        second = balancer.acquire(exclude=first)
+        assert second is not first
+        assert balancer.acquire(exclude=second) is first
+
+    def test_no_endpoint_left_after_exclude(self):
+        balancer = EndpointBalancer(['a'])
+        assert balancer.acquire(exclude=balancer.acquire()) is None
+
+    @mock.patch('react.balancer.monotonic')
+    def test_failing_endpoint_is_unhealthy_until_cooldown(self, monotonic):
+        monotonic.return_value = 100
+        balancer = EndpointBalancer(['a', 'b'], failure_threshold=2, cooldown=10)
+        a, b = balancer.endpoints
+
+        for _ in range(2):
+            balancer.acquire(exclude=b)
+            balancer.release(a, failed=True)
+
+        assert [balancer.acquire() for _ in range(3)] == [b, b, b]
+        assert not balancer.stats()['endpoints']['a']['healthy']
+
+        monotonic.return_value = 110
+        assert balancer.acquire() is a
+
+    def test_success_resets_failures(self):
+        balancer = EndpointBalancer(['a', 'b'], failure_threshold=2)
+        a, b = balancer.endpoints
+
+        balancer.acquire(exclude=b)
+        balancer.release(a, failed=True)
+        balancer.acquire(exclude=b)
+        balancer.release(a, 0.1)
+        balancer.acquire(exclude=b)
+        balancer.release(a, failed=True)
+
+        assert balancer.stats()['endpoints']['a'] == {'outstanding': 0, 'failures': 1, 'healthy': True}
+
+    def test_uses_unhealthy_endpoints_if_none_are_healthy(self):
+        balancer = EndpointBalancer(['a'], failure_threshold=1)
+        a = balancer.acquire()
+        balancer.release(a, failed=True)
+
+        assert balancer.acquire() is a
+
+    def test_latency_percentile(self):
+        balancer = EndpointBalancer(['a', 'b'])
+        for latency in range(1, 101):
+            balancer.release(balancer.acquire(), latency / 100.0)
+
+        assert balancer.latency_percentile(95) == 0.96
+        assert balancer.latency_percentile(50) == 0.51
+        assert balancer.latency_percentile(95, min_samples=101) is None
+
+    def test_latency_window(self):
+        balancer = EndpointBalancer(['a'], latency_window=10)
+        for latency in range(100):
+            balancer.release(balancer.acquire(), latency)
+
+        assert balancer.latency_percentile(0, min_samples=10) == 90
@@ -0,0 +1,115 @@
+import mock
+
+from react.breaker import CircuitBreaker, breaker_state_changed
+
+
+class TestCircuitBreaker(object):
+    def fail(self, breaker, times):
+        for _ in range(times):
+            assert breaker.allow_request()
+            breaker.record_failure()
+
+    def test_allows_requests_when_closed(self):
+        breaker = CircuitBreaker()
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_needs_min_requests_to_open(self):
+        breaker = CircuitBreaker(min_requests=5)
+        self.fail(breaker, 4)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        self.fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert breaker.stats()['rejected'] == 1
+
+    def test_stays_closed_under_error_threshold(self):
+        breaker = CircuitBreaker(error_threshold=0.5, min_requests=4, window=4)
+        for _ in range(3):
+            breaker.record_success(0.1)
+        self.fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        self.fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_slow_renders_count_as_failures(self):
+        breaker = CircuitBreaker(min_requests=2, latency_budget=0.5)
+        breaker.record_success(0.4)
+        breaker.record_success(0.6)
+        assert breaker.state == CircuitBreaker.OPEN
+
+    @mock.patch('react.breaker.monotonic')
+    def test_half_open_trial_success_closes(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(min_requests=1, reset_timeout=30)
+        self.fail(breaker, 1)
+
+        monotonic.return_value = 129
+        assert not breaker.allow_request()
+
+        monotonic.return_value = 130
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # Only one trial request at a time
+        assert not breaker.allow_request()
+
+        breaker.record_success(0.1)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+
+    @mock.patch('react.breaker.monotonic')
+    def test_half_open_trial_failure_reopens(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(min_requests=1, reset_timeout=30)
+        self.fail(breaker, 1)
+
+        monotonic.return_value = 130
+        self.fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        monotonic.return_value = 159
+        assert not breaker.allow_request()
+
+    @mock.patch('react.breaker.monotonic')
+    def test_renders_in_flight_when_breaker_opens_are_ignored(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(min_requests=10, window=10, reset_timeout=30)
+        assert all(breaker.allow_request() for _ in range(30))
+
+        for _ in range(30):
+            breaker.record_failure()
+        breaker.record_success(0.1)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()['open_count'] == 1
+
+        # The breaker was opened by the tenth failure, so the trial render is still due 30 seconds after it
+        monotonic.return_value = 130
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    def test_state_changes_are_signalled_and_counted(self):
+        breaker = CircuitBreaker(min_requests=1, reset_timeout=0)
+        changes = []
+
+        def receiver(sender, old_state, new_state):
+            changes.append((old_state, new_state, sender.stats()['state']))
+
+        with breaker_state_changed.connected_to(receiver, sender=breaker):
+            self.fail(breaker, 1)
+            assert breaker.allow_request()
+            breaker.record_success(0.1)
+
+        assert changes == [
+            ('closed', 'open', 'open'),
+            ('open', 'half_open', 'half_open'),
+            ('half_open', 'closed', 'closed'),
+        ]
+        assert breaker.stats() == {
+            'state': 'closed',
+            'rejected': 0,
+            'open_count': 1,
+            'half_open_count': 1,
+            'closed_count': 1,
+        }
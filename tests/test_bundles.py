@@ -0,0 +1,51 @@
+from react.bundles import BundleIndex, BundleManifest
+
+
+class TestBundleManifest(object):
+    def test_urls(self):
+        manifest = BundleManifest({'main': 'main.abc.js', 'vendor': 'vendor.def.js'}, '/static/')
+        assert manifest.urls == {'main': '/static/main.abc.js', 'vendor': '/static/vendor.def.js'}
+        assert manifest.vendor_url == '/static/vendor.def.js'
+
+    def test_default_vendor_url(self):
+        assert BundleManifest({}, '/static/').vendor_url == '/static/vendor.js'
+
+
+class TestBundleIndex(object):
+    def test_same_files_share_a_manifest(self):
+        index = BundleIndex()
+        first = index.get({'main': 'main.js', 'vendor': 'vendor.js'}, '/')
+        second = index.get({'vendor': 'vendor.js', 'main': 'main.js'}, '/')
+
+        assert second is first
+        assert len(index) == 1
+
+    def test_different_files_or_bundle_url(self):
+        index = BundleIndex()
+        manifest = index.get({'main': 'main.js'}, '/')
+
+        assert index.get({'main': 'main.2.js'}, '/') is not manifest
+        assert index.get({'main': 'main.js'}, '/static/') is not manifest
+        assert len(index) == 3
+
+    def test_manifest_keeps_its_own_files(self):
+        index = BundleIndex()
+        files = {'main': 'main.js'}
+        manifest = index.get(files, '/')
+        files['main'] = 'changed.js'
+
+        assert manifest.files == {'main': 'main.js'}
+
+    def test_max_entries(self):
+        index = BundleIndex(max_entries=2)
+        for i in range(3):
+            index.get({'main': 'main.{}.js'.format(i)}, '/')
+
+        assert len(index) == 1
+
+    def test_clear(self):
+        index = BundleIndex()
+        index.get({'main': 'main.js'}, '/')
+        index.clear()
+
+        assert len(index) == 0
@@ -1,3 +1,9 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
 from flask import render_template_string
 import flask_featureflags
 from flask_caching import Cache
@@ -5,8 +11,10 @@ from flask_caching import Cache
 from dmutils.flask_init import pluralize, init_manager
 from dmutils.forms import FakeCsrf
 from .helpers import BaseApplicationTest
+from .test_render_server import RenderConfig
 
 import pytest
+import responses
 
 
 @pytest.mark.parametrize("count,singular,plural,output", [
@@ -45,6 +53,88 @@ class TestInitManager(BaseApplicationTest):
         init_manager(self.flask, 5000, [])
 
 
+class TestPrerenderCommand(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestPrerenderCommand, self).setup()
+        self.directory = tempfile.mkdtemp()
+        self.flask.config['REACT_RENDER_PRERENDER_COMPONENTS'] = [('/footer.js', {'year': 2016})]
+        self.manager = init_manager(self.flask, 5000, [])
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    @responses.activate
+    def test_prerender(self, capsys):
+        responses.add(responses.POST, self.flask.config['REACT_RENDER_URL'], json={
+            'markup': '<footer></footer>', 'slug': 'footer', 'files': {'footer': 'footer.js'}
+        })
+        output_dir = os.path.join(self.directory, 'prerendered')
+
+        self.manager._commands['prerender'](self.flask, output_dir=output_dir)
+
+        with open(os.path.join(output_dir, 'manifest.json')) as f:
+            components = json.load(f)['components']
+        assert [component['path'] for component in components] == ['/footer.js']
+        with open(os.path.join(output_dir, components[0]['markup'])) as f:
+            assert f.read() == '<footer></footer>'
+        assert capsys.readouterr().out == 'Prerendered 1 components to {}\n'.format(output_dir)
+
+    @responses.activate
+    def test_prerender_to_configured_directory(self):
+        responses.add(responses.POST, self.flask.config['REACT_RENDER_URL'], json={'markup': '<footer></footer>'})
+        self.flask.config['REACT_RENDER_PRERENDER_DIR'] = self.directory
+
+        self.manager._commands['prerender'](self.flask)
+
+        assert os.path.exists(os.path.join(self.directory, 'manifest.json'))
+
+
+class TestFingerprintAssetsCommand(BaseApplicationTest):
+    def setup(self):
+        super(TestFingerprintAssetsCommand, self).setup()
+        self.manager = init_manager(self.flask, 5000, [])
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        # The command fingerprints app/static under the working directory
+        os.makedirs(os.path.join(self.directory, 'app', 'static', 'images'))
+        with open(os.path.join(self.directory, 'app', 'static', 'application.css'), 'wb') as f:
+            f.write(b'body {}')
+        with open(os.path.join(self.directory, 'app', 'static', 'images', 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n\xff')
+        os.chdir(self.directory)
+
+    def teardown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_fingerprint_assets(self, capsys):
+        output = os.path.join(self.directory, 'build', 'manifest.json')
+        os.makedirs(os.path.dirname(output))
+
+        self.manager._commands['fingerprint_assets'](self.flask, output=output, processes='1')
+
+        with open(output) as f:
+            manifest = json.load(f)
+        assert manifest == {
+            'digest': 'md5',
+            'assets': {
+                'application.css': hashlib.md5(b'body {}').hexdigest(),
+                'images/logo.png': hashlib.md5(b'\x89PNG\r\n\x1a\n\xff').hexdigest(),
+            },
+        }
+        assert capsys.readouterr().out == 'Fingerprinted 2 assets to {}\n'.format(output)
+
+    def test_fingerprint_assets_to_configured_manifest(self):
+        self.flask.config['DM_ASSET_MANIFEST'] = 'asset-manifest.json'
+
+        self.manager._commands['fingerprint_assets'](self.flask, processes='1')
+
+        with open(os.path.join(self.directory, 'asset-manifest.json')) as f:
+            assert sorted(json.load(f)['assets']) == ['application.css', 'images/logo.png']
+
+
 class TestFeatureFlags(BaseApplicationTest):
 
     def setup(self):
@@ -0,0 +1,89 @@
+import mock
+
+from react.instrumentation import RenderMetrics, log_render_stats, percentile
+
+from .helpers import BaseApplicationTest
+
+
+def render_stats(time, status='rendered', error=None, response_bytes=100):
+    return {
+        'time': time,
+        'serialization_time': 0.001,
+        'request_bytes': 50,
+        'response_bytes': response_bytes,
+        'status': status,
+        'error': error,
+    }
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 51
+    assert percentile(values, 95) == 96
+    assert percentile(values, 100) == 100
+    assert percentile([7], 99) == 7
+
+
+class TestRenderMetrics(object):
+    def test_summary_by_path(self):
+        metrics = RenderMetrics()
+        for i in range(1, 101):
+            metrics.record('/slow.js', render_stats(i / 100.0))
+        metrics.record('/fast.js', render_stats(0.001))
+
+        summary = metrics.summary()
+        assert summary['/slow.js']['count'] == 100
+        assert summary['/slow.js']['time'] == {'p50': 0.51, 'p95': 0.96, 'p99': 1.0}
+        assert summary['/fast.js']['time'] == {'p50': 0.001, 'p95': 0.001, 'p99': 0.001}
+
+    def test_statuses_and_errors_are_counted(self):
+        metrics = RenderMetrics()
+        metrics.record('/a.js', render_stats(0.1))
+        metrics.record('/a.js', render_stats(0.1, status='cached', response_bytes=None))
+        metrics.record('/a.js', render_stats(0.1, status='error', error='RenderServerError', response_bytes=None))
+
+        summary = metrics.summary()['/a.js']
+        assert summary['statuses'] == {'rendered': 1, 'cached': 1, 'error': 1}
+        assert summary['errors'] == {'RenderServerError': 1}
+        assert summary['response_bytes'] == {'p50': 100, 'p95': 100, 'p99': 100}
+
+    def test_missing_samples_are_empty(self):
+        metrics = RenderMetrics()
+        metrics.record('/a.js', render_stats(0.1, response_bytes=None))
+
+        assert metrics.summary()['/a.js']['response_bytes'] == {}
+
+    def test_samples_are_limited_to_window(self):
+        metrics = RenderMetrics(window=2)
+        for time in (10, 1, 2):
+            metrics.record('/a.js', render_stats(time))
+
+        summary = metrics.summary(percentiles=(100,))['/a.js']
+        assert summary['count'] == 3
+        assert summary['time'] == {'p100': 2}
+
+    def test_clear(self):
+        metrics = RenderMetrics()
+        metrics.record('/a.js', render_stats(0.1))
+        metrics.clear()
+
+        assert metrics.summary() == {}
+
+
+class TestLogRenderStats(BaseApplicationTest):
+    def test_logs_render(self):
+        with self.flask.app_context(), mock.patch.object(self.flask, 'logger') as logger:
+            log_render_stats(None, path='/a.js', stats=render_stats(0.25))
+
+        logger.info.assert_called_once_with(
+            'react.render {component} {status} in {render_time:.3f}s',
+            extra={
+                'component': '/a.js',
+                'status': 'rendered',
+                'render_time': 0.25,
+                'serialization_time': 0.001,
+                'request_bytes': 50,
+                'response_bytes': 100,
+                'error': None,
+            }
+        )
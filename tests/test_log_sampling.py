@@ -0,0 +1,195 @@
+import mock
+import pytest
+from flask import Flask, request
+
+from dmutils.log_sampling import RequestLogSampler, SamplingRule, TokenBucket
+from dmutils.logging import init_app
+
+
+def test_token_bucket_allows_bursts_then_refills():
+    bucket = TokenBucket(rate=2, burst=3, now=0)
+
+    assert [bucket.take(0) for _ in range(4)] == [True, True, True, False]
+    assert bucket.take(0.5)
+    assert not bucket.take(0.5)
+    assert [bucket.take(10) for _ in range(4)] == [True, True, True, False]
+
+
+def test_sampling_rule_cannot_match_rule_and_prefix():
+    with pytest.raises(ValueError):
+        SamplingRule(rule='/', prefix='/')
+
+
+class TestRequestLogSampler(object):
+    def setup(self):
+        self.app = Flask('test_app', static_folder=None)
+
+        @self.app.route('/')
+        def index():
+            return 'index'
+
+        @self.app.route('/_status')
+        def status():
+            return 'ok'
+
+        @self.app.route('/static/<path:filename>')
+        def static(filename):
+            return filename
+
+    def _should_log(self, sampler, path, status=200, duration=0.01):
+        with self.app.test_request_context(path):
+            self.app.preprocess_request()
+            return sampler.should_log(request, status, duration)
+
+    def test_logs_everything_by_default(self):
+        sampler = RequestLogSampler()
+
+        assert all(self._should_log(sampler, '/') for _ in range(10))
+        assert sampler.pop_summary(force=True) is None
+
+    def test_samples_url_rule(self):
+        sampler = RequestLogSampler(rules=[SamplingRule(rule='/_status', sample_rate=0.25)])
+        sampler.random = mock.Mock()
+        sampler.random.random.side_effect = [0.1, 0.5, 0.2, 0.9]
+
+        assert [self._should_log(sampler, '/_status') for _ in range(4)] == [True, False, True, False]
+        assert self._should_log(sampler, '/')
+        assert sampler.pop_summary(force=True) == {'/_status': {'sampled_out': 2, 'rate_limited': 0}}
+
+    def test_rate_limits_path_prefix_per_route(self):
+        sampler = RequestLogSampler(rules=[SamplingRule(prefix='/static/', rate_limit=1, burst=2)])
+
+        with mock.patch('dmutils.log_sampling.monotonic', return_value=100):
+            assert [self._should_log(sampler, '/static/app.js') for _ in range(3)] == [True, True, False]
+            assert [self._should_log(sampler, '/static/app.css') for _ in range(2)] == [False, False]
+            assert [self._should_log(sampler, '/_status') for _ in range(3)] == [True, True, True]
+
+        with mock.patch('dmutils.log_sampling.monotonic', return_value=101):
+            assert [self._should_log(sampler, '/static/app.js') for _ in range(2)] == [True, False]
+
+        assert sampler.pop_summary(force=True) == {
+            '/static/<path:filename>': {'sampled_out': 0, 'rate_limited': 4},
+        }
+
+    def test_rate_limits_each_route_separately(self):
+        sampler = RequestLogSampler(default=SamplingRule(rate_limit=1, burst=1))
+
+        with mock.patch('dmutils.log_sampling.monotonic', return_value=100):
+            assert [self._should_log(sampler, '/') for _ in range(2)] == [True, False]
+            assert [self._should_log(sampler, '/_status') for _ in range(2)] == [True, False]
+
+        assert sampler.pop_summary(force=True) == {
+            '/': {'sampled_out': 0, 'rate_limited': 1},
+            '/_status': {'sampled_out': 0, 'rate_limited': 1},
+        }
+
+    def test_unmatched_requests_are_counted_under_rule_prefix(self):
+        sampler = RequestLogSampler(rules=[SamplingRule(prefix='/missing', sample_rate=0)])
+
+        assert not self._should_log(sampler, '/missing/page', status=200)
+        assert sampler.pop_summary(force=True) == {'/missing': {'sampled_out': 1, 'rate_limited': 0}}
+
+    def test_first_matching_rule_is_used(self):
+        sampler = RequestLogSampler(rules=[
+            SamplingRule(rule='/static/<path:filename>'),
+            SamplingRule(prefix='/static/', sample_rate=0),
+        ])
+
+        assert self._should_log(sampler, '/static/app.js')
+
+    def test_default_rule_applies_to_unmatched_requests(self):
+        sampler = RequestLogSampler(default=SamplingRule(sample_rate=0))
+
+        assert not self._should_log(sampler, '/')
+        assert sampler.pop_summary(force=True) == {'/': {'sampled_out': 1, 'rate_limited': 0}}
+
+    def test_errors_and_slow_requests_are_always_logged(self):
+        sampler = RequestLogSampler(default=SamplingRule(sample_rate=0), slow_threshold=1)
+
+        assert self._should_log(sampler, '/', status=404)
+        assert self._should_log(sampler, '/', status=500)
+        assert self._should_log(sampler, '/', duration=1.5)
+        assert not self._should_log(sampler, '/', duration=0.5)
+        assert not self._should_log(sampler, '/', status=302)
+
+    def test_summary_is_only_given_every_interval(self):
+        with mock.patch('dmutils.log_sampling.monotonic', return_value=0):
+            sampler = RequestLogSampler(default=SamplingRule(sample_rate=0), summary_interval=60)
+            self._should_log(sampler, '/')
+
+        with mock.patch('dmutils.log_sampling.monotonic', return_value=30):
+            assert sampler.pop_summary() is None
+        with mock.patch('dmutils.log_sampling.monotonic', return_value=60):
+            assert sampler.pop_summary() == {'/': {'sampled_out': 1, 'rate_limited': 0}}
+            assert sampler.pop_summary() is None
+
+    def test_from_config(self):
+        sampler = RequestLogSampler.from_config({
+            'DM_REQUEST_LOG_RULES': [{'rule': '/_status', 'sample_rate': 0.1}, {'prefix': '/static/', 'rate_limit': 5}],
+            'DM_REQUEST_LOG_RATE_LIMIT': 100,
+            'DM_REQUEST_LOG_SLOW_THRESHOLD': 2,
+        })
+
+        assert [(rule.rule, rule.prefix, rule.sample_rate, rule.rate_limit, rule.burst) for rule in sampler.rules] == [
+            ('/_status', None, 0.1, None, 1),
+            (None, '/static/', 1.0, 5, 5),
+        ]
+        assert sampler.default.rate_limit == 100
+        assert sampler.default.burst == 100
+        assert sampler.always_log_status == 400
+        assert sampler.slow_threshold == 2
+
+
+class TestRequestLogSampling(object):
+    def setup(self):
+        self.app = Flask('test_app', static_folder=None)
+        self.app.config['DM_REQUEST_LOG_RULES'] = [{'rule': '/_status', 'sample_rate': 0}]
+        init_app(self.app)
+
+        @self.app.route('/')
+        def index():
+            return 'index'
+
+        @self.app.route('/_status')
+        def status():
+            return 'ok'
+
+        @self.app.route('/_status/error')
+        def status_error():
+            return 'error', 500
+
+        self.client = self.app.test_client()
+
+    def _logged_messages(self, logger_info):
+        return [call[0][0].format(**call[1]['extra']) for call in logger_info.call_args_list]
+
+    def test_sampled_out_requests_are_not_logged(self):
+        with mock.patch.object(self.app.logger, 'info') as logger_info:
+            self.client.get('/_status')
+            self.client.get('/')
+            self.client.get('/_status/error')
+
+        assert self._logged_messages(logger_info) == [
+            'GET http://localhost/ 200',
+            'GET http://localhost/_status/error 500',
+        ]
+
+    def test_request_log_handler_is_sampled(self):
+        request_log_handler = mock.Mock()
+        self.app.extensions['request_log_handler'] = request_log_handler
+
+        self.client.get('/_status')
+        self.client.get('/')
+
+        assert request_log_handler.call_count == 1
+
+    def test_suppressed_requests_are_summarised(self):
+        self.app.extensions['request_log_sampler'].summary_interval = 0
+
+        with mock.patch.object(self.app.logger, 'info') as logger_info:
+            self.client.get('/_status')
+            self.client.get('/_status')
+
+        assert self._logged_messages(logger_info) == [
+            'Suppressed 1 sampled out and 0 rate limited request logs for /_status',
+        ]
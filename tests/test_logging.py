@@ -5,10 +5,16 @@ import mock
 import responses
 import six
 import json
+import sys
+import threading
+from datetime import datetime
+
+import pytest
 
 from dmutils import request_id
 from dmutils.email import EmailError
-from dmutils.logging import init_app, RequestIdFilter, JSONFormatter, CustomLogFormatter
+from dmutils.logging import init_app, RequestIdFilter, JSONFormatter, CustomLogFormatter, AsyncLogHandler
+from dmutils.logging import FanOutLogHandler
 from dmutils.logging import LOG_FORMAT, TIME_FORMAT, slack_escape, notify_team
 
 from tests.helpers import BaseApplicationTest, Config
@@ -47,11 +53,308 @@ def test_init_app_adds_file_handlers_with_log_path(app):
         app.config['DM_LOG_PATH'] = f.name
         init_app(app)
 
-        assert len(app.logger.handlers) == 2
-        assert isinstance(app.logger.handlers[0], logging.FileHandler)
-        assert isinstance(app.logger.handlers[0].formatter, CustomLogFormatter)
-        assert isinstance(app.logger.handlers[1], logging.FileHandler)
-        assert isinstance(app.logger.handlers[1].formatter, JSONFormatter)
+        assert len(app.logger.handlers) == 1
+        assert isinstance(app.logger.handlers[0], FanOutLogHandler)
+        handlers = app.logger.handlers[0].handlers
+        assert isinstance(handlers[0], logging.FileHandler)
+        assert isinstance(handlers[0].formatter, CustomLogFormatter)
+        assert isinstance(handlers[1], logging.FileHandler)
+        assert isinstance(handlers[1].formatter, JSONFormatter)
+
+
+def test_file_handlers_write_text_and_json_lines(app):
+    with tempfile.NamedTemporaryFile() as f:
+        app.config['DM_LOG_PATH'] = f.name
+        app.config['DM_APP_NAME'] = 'fan-out-app'
+        init_app(app)
+
+        with mock.patch.object(RequestIdFilter, 'filter', autospec=True, return_value=True) as request_id_filter:
+            app.logger.info('hello {foo}', extra={'foo': 'bar'})
+            assert request_id_filter.call_count == 1
+
+        text = open(f.name).read().splitlines()[-1]
+        result = json.loads(open(f.name + '.json').read().splitlines()[-1])
+        assert text.endswith('"hello bar" [in {}:{}]'.format(result['pathname'], result['lineno']))
+        assert ' fan-out-app ' in text
+        assert result['message'] == 'hello bar'
+        assert result['application'] == 'fan-out-app'
+        assert result['foo'] == 'bar'
+
+
+def test_init_app_adds_async_handler_with_log_async(app):
+    with tempfile.NamedTemporaryFile() as f:
+        app.config['DM_LOG_PATH'] = f.name
+        app.config['DM_LOG_ASYNC'] = True
+        init_app(app)
+
+        assert len(app.logger.handlers) == 1
+        handler = app.logger.handlers[0]
+        assert isinstance(handler, AsyncLogHandler)
+        assert [type(target) for target in handler.handlers] == [FanOutLogHandler]
+        assert not handler.handlers[0].filters
+        handler.close()
+
+
+def test_async_logging_writes_request_id_of_request_thread(app):
+    with tempfile.NamedTemporaryFile() as f:
+        app.config['DM_LOG_PATH'] = f.name
+        app.config['DM_LOG_ASYNC'] = True
+        app.config['DM_APP_NAME'] = 'async-app'
+        request_id.init_app(app)
+        init_app(app)
+
+        with app.test_request_context('/', headers={'DM-Request-Id': 'generated'}):
+            app.logger.info('hello {foo}', extra={'foo': 'bar'})
+        app.logger.handlers[0].close()
+
+        with open(f.name + '.json') as json_file:
+            result = json.loads(json_file.readlines()[-1])
+        assert result['message'] == 'hello bar'
+        assert result['requestId'] == 'generated'
+        assert result['application'] == 'async-app'
+        assert 'generated' in open(f.name).read()
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        super(BlockingHandler, self).__init__()
+        self.records = []
+        self.started = threading.Event()
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.started.set()
+        self.unblock.wait(5)
+        self.records.append(record)
+
+
+class TestAsyncLogHandler(object):
+    def setup(self):
+        self.target = BlockingHandler()
+        self.logger = logging.getLogger('async-logging-test')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+
+    def teardown(self):
+        self.target.unblock.set()
+        for handler in self.logger.handlers:
+            handler.close()
+        del self.logger.handlers[:]
+
+    def _fill_queue(self, overflow):
+        handler = AsyncLogHandler([self.target], capacity=1, overflow=overflow)
+        self.logger.addHandler(handler)
+        self.logger.info('first')
+        assert self.target.started.wait(5)
+        self.logger.info('second')
+        return handler
+
+    def test_records_are_written_by_listener_thread(self):
+        handler = AsyncLogHandler([self.target])
+        self.logger.addHandler(handler)
+        self.target.unblock.set()
+
+        self.logger.info('hello %s', 'world')
+        handler.flush()
+
+        assert [record.getMessage() for record in self.target.records] == ['hello world']
+
+    def test_exception_is_formatted_before_queueing(self):
+        handler = AsyncLogHandler([self.target])
+        self.logger.addHandler(handler)
+        self.target.unblock.set()
+
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            self.logger.exception('failed')
+        handler.flush()
+
+        record = self.target.records[0]
+        assert record.exc_info is None
+        assert 'ValueError: oops' in record.exc_text
+
+    def test_records_below_target_level_are_skipped(self):
+        handler = AsyncLogHandler([self.target])
+        self.logger.addHandler(handler)
+        self.target.setLevel(logging.INFO)
+        self.target.unblock.set()
+
+        self.logger.debug('debug')
+        self.logger.info('info')
+        handler.flush()
+
+        assert [record.getMessage() for record in self.target.records] == ['info']
+
+    def test_count_drops_drops_records_and_reports_them(self):
+        handler = self._fill_queue(AsyncLogHandler.COUNT_DROPS)
+
+        self.logger.info('third')
+        self.logger.error('fourth')
+        assert handler.dropped == 2
+
+        self.target.unblock.set()
+        handler.flush()
+
+        assert [record.getMessage() for record in self.target.records] == [
+            'first', 'Log queue full: dropped 2 log records', 'second',
+        ]
+        assert self.target.records[1].levelno == logging.WARNING
+
+    def test_drop_debug_only_drops_debug_records(self):
+        handler = self._fill_queue(AsyncLogHandler.DROP_DEBUG)
+
+        self.logger.debug('debug')
+        assert handler.dropped == 1
+
+        thread = threading.Thread(target=self.logger.warning, args=('warning',))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+
+        self.target.unblock.set()
+        thread.join(5)
+        handler.flush()
+
+        assert [record.getMessage() for record in self.target.records] == ['first', 'second', 'warning']
+
+    def test_block_waits_for_space_in_queue(self):
+        handler = self._fill_queue(AsyncLogHandler.BLOCK)
+
+        thread = threading.Thread(target=self.logger.debug, args=('debug',))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+
+        self.target.unblock.set()
+        thread.join(5)
+        handler.flush()
+
+        assert handler.dropped == 0
+        assert [record.getMessage() for record in self.target.records] == ['first', 'second', 'debug']
+
+    def test_close_writes_queued_records(self):
+        handler = AsyncLogHandler([self.target])
+        self.logger.addHandler(handler)
+        for i in range(10):
+            self.logger.info('record %d', i)
+
+        self.target.unblock.set()
+        handler.close()
+
+        assert len(self.target.records) == 10
+        assert not handler._thread.is_alive()
+
+    def test_queued_record_is_a_copy(self):
+        handler = AsyncLogHandler([self.target])
+        self.logger.addHandler(handler)
+        self.target.unblock.set()
+
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            record = self.logger.makeRecord(
+                self.logger.name, logging.ERROR, '/path.py', 10, 'hello %s', ('world',), sys.exc_info()
+            )
+        self.logger.handle(record)
+        handler.flush()
+
+        assert record.msg == 'hello %s'
+        assert record.args == ('world',)
+        assert record.exc_info is not None
+        assert self.target.records[0] is not record
+        assert self.target.records[0].getMessage() == 'hello world'
+
+    def test_listener_can_log_while_a_thread_waits_for_space(self):
+        handler = AsyncLogHandler([self.target], capacity=1, overflow=AsyncLogHandler.BLOCK)
+        self.logger.addHandler(handler)
+        target_emit = self.target.emit
+
+        def emit(record):
+            target_emit(record)
+            if record.getMessage() == 'first':
+                # Like the formatter logging that it failed to format a message
+                self.logger.warning('from listener')
+        self.target.emit = emit
+
+        self.logger.info('first')
+        assert self.target.started.wait(5)
+        self.logger.info('second')
+        thread = threading.Thread(target=self.logger.info, args=('third',))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+
+        self.target.unblock.set()
+        thread.join(5)
+        assert not thread.is_alive()
+        handler.flush()
+
+        assert [record.getMessage() for record in self.target.records] == [
+            'first', 'from listener', 'second', 'third',
+        ]
+
+    def test_unknown_overflow_policy(self):
+        with pytest.raises(ValueError):
+            AsyncLogHandler([self.target], overflow='ignore')
+
+
+class TestFanOutLogHandler(object):
+    def setup(self):
+        self.text_buffer, self.json_buffer = StringIO(), StringIO()
+        self.text_handler = logging.StreamHandler(self.text_buffer)
+        self.text_handler.setFormatter(CustomLogFormatter(LOG_FORMAT, TIME_FORMAT))
+        self.json_handler = logging.StreamHandler(self.json_buffer)
+        self.json_handler.setFormatter(JSONFormatter(LOG_FORMAT, TIME_FORMAT))
+
+        self.handler = FanOutLogHandler([self.text_handler, self.json_handler])
+        self.handler.setFormatter(CustomLogFormatter(LOG_FORMAT, TIME_FORMAT))
+        self.handler.addFilter(RequestIdFilter())
+        self.logger = logging.getLogger('fan-out-logging-test')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def teardown(self):
+        del self.logger.handlers[:]
+
+    def _record(self, msg, extra=None, exc_info=None):
+        record = self.logger.makeRecord(
+            self.logger.name, logging.INFO, '/path.py', 10, msg, None, exc_info, extra=extra
+        )
+        record.app_name = 'app'
+        return record
+
+    def test_writes_the_same_lines_as_separate_handlers(self):
+        record = self._record('hello {foo}', {'foo': 'bar'})
+        self.logger.handle(record)
+
+        assert self.text_buffer.getvalue() == self.text_handler.format(record) + '\n'
+        assert json.loads(self.json_buffer.getvalue()) == json.loads(self.json_handler.format(record))
+
+    def test_exception_is_written_to_both(self):
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            self.logger.exception('failed')
+
+        assert 'ValueError: oops' in self.text_buffer.getvalue()
+        assert 'ValueError: oops' in json.loads(self.json_buffer.getvalue())['exc_info']
+
+    def test_message_is_interpolated_once(self):
+        with mock.patch.object(CustomLogFormatter, 'format_message', autospec=True, return_value='hi') as format_message:
+            self.logger.info('hello {foo}', extra={'foo': 'bar'})
+
+        assert format_message.call_count == 1
+        assert '"hi"' in self.text_buffer.getvalue()
+        assert json.loads(self.json_buffer.getvalue())['message'] == 'hi'
+
+    def test_handler_levels_are_respected(self):
+        self.json_handler.setLevel(logging.WARNING)
+        self.logger.info('hello')
+
+        assert '"hello"' in self.text_buffer.getvalue()
+        assert self.json_buffer.getvalue() == ''
 
 
 class TestJSONFormatter(object):
@@ -113,6 +416,63 @@ class TestJSONFormatter(object):
 
         assert result['message'].startswith("failed to format log message")
 
+    def _record(self, msg='hello {foo}', extra=None):
+        record = logging.LogRecord('name', logging.INFO, '/path.py', 10, msg, None, None)
+        record.created = 1500000000
+        record.__dict__.update(extra or {'foo': 'bar'})
+        record.app_name = 'app'
+        record.request_id = 'request-id'
+        return record
+
+    def test_output_has_fixed_key_order(self):
+        formatter = JSONFormatter(LOG_FORMAT, '%Y')
+
+        assert formatter.format(self._record()) == (
+            '{"name": "name", "levelname": "INFO", "message": "hello bar", "pathname": "/path.py", "lineno": 10, '
+            '"foo": "bar", "time": "2017", "requestId": "request-id", "application": "app", "logType": "application"}'
+        )
+
+    def test_extra_fields_are_encoded_like_json(self):
+        extra = {
+            'text': u'caf\xe9 "quoted"', 'number': 1.5, 'flag': True, 'nothing': None, 'items': [1, {'a': 'b'}],
+            'when': datetime(2017, 1, 2, 3, 4, 5), 'error': ValueError('oops'), '_private': 'hidden',
+        }
+        result = json.loads(self.formatter.format(self._record('hello', extra)))
+
+        assert result['text'] == u'caf\xe9 "quoted"'
+        assert result['number'] == 1.5
+        assert result['flag'] is True
+        assert result['nothing'] is None
+        assert result['items'] == [1, {'a': 'b'}]
+        assert result['when'] == '2017-01-02T03:04:05'
+        assert result['error'] == 'oops'
+        assert '_private' not in result
+
+    def test_output_is_ascii(self):
+        output = self.formatter.format(self._record(u'caf\xe9'))
+
+        assert '\\u00e9' in output
+        assert json.loads(output)['message'] == u'caf\xe9'
+
+    def test_exception_is_written_before_extra_fields(self):
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            self.logger.exception("failed", extra={'foo': 'bar'})
+        keys = [key for key, _ in json.loads(self.buffer.getvalue(), object_pairs_hook=list)]
+
+        assert keys.index('exc_info') == keys.index('lineno') + 1
+        assert keys.index('foo') == keys.index('exc_info') + 1
+        assert 'ValueError: oops' in json.loads(self.buffer.getvalue())['exc_info']
+
+    def test_orjson_backend_produces_equivalent_json(self):
+        pytest.importorskip('orjson')
+        formatter = JSONFormatter(LOG_FORMAT, TIME_FORMAT, backend='auto')
+        extra = {'items': [1, {'a': 'b'}], 'when': datetime(2017, 1, 2, 3, 4, 5), 'foo': 'bar'}
+
+        assert json.loads(formatter.format(self._record(extra=extra))) == \
+            json.loads(self.formatter.format(self._record(extra=extra)))
+
 
 class TestCustomLogFormatter(object):
     def _create_logger(self, name, formatter):
@@ -152,6 +512,61 @@ class TestCustomLogFormatter(object):
 
         assert 'failed to format log message' in result
 
+    def test_failed_log_message_formatting_is_only_logged_once(self):
+        for i in range(3):
+            self.logger.info("hello {barry}")
+        result = self.dmbuffer.getvalue()
+
+        assert result.count('failed to format log message') == 1
+        assert 'Traceback' not in result
+        assert self.buffer.getvalue().count('"hello {barry}"') == 3
+
+    def test_malformed_log_message_is_unchanged(self):
+        self.logger.info("hello {")
+        self.logger.info("hello {0}")
+
+        assert '"hello {"' in self.buffer.getvalue()
+        assert '"hello {0}"' in self.buffer.getvalue()
+        assert self.dmbuffer.getvalue().count('failed to format log message') == 2
+
+    def test_log_message_with_escaped_braces(self):
+        self.logger.info("hello {{foo}}")
+
+        assert '"hello {foo}"' in self.buffer.getvalue()
+
+    def test_log_message_can_use_record_and_format_fields(self):
+        self.logger.info("{levelname} {request_id} {foo[0]}", extra={'foo': ['bar']})
+
+        assert '"INFO None bar"' in self.buffer.getvalue()
+
+    def test_log_message_args_are_interpolated_before_fields(self):
+        self.logger.info("%s {foo}", 'hello', extra={'foo': 'bar'})
+
+        assert '"hello bar"' in self.buffer.getvalue()
+
+    def test_braces_outside_the_message_are_not_formatted(self):
+        try:
+            raise ValueError({'key': 'value'})
+        except ValueError:
+            self.logger.exception("hello {foo}", extra={'foo': 'bar'})
+        result = self.buffer.getvalue()
+
+        assert '"hello bar"' in result
+        assert "ValueError: {'key': 'value'}" in result
+        assert self.dmbuffer.getvalue() == ''
+
+    def test_format_matches_standard_formatter(self):
+        record = logging.LogRecord('name', logging.INFO, '/path.py', 10, 'hello %s', ('world',), None)
+        record.app_name = 'app'
+        record.request_id = 'request-id'
+
+        assert self.formatter.format(record) == logging.Formatter(LOG_FORMAT, TIME_FORMAT).format(record)
+
+    def test_log_format_fields_are_worked_out_once(self):
+        assert self.formatter.fields == (
+            'asctime', 'app_name', 'name', 'levelname', 'request_id', 'message', 'pathname', 'lineno',
+        )
+
 
 def test_slack_escape():
     assert slack_escape('') == ''
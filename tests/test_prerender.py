@@ -0,0 +1,148 @@
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+import pytest
+import responses
+
+from react.exceptions import RenderServerError
+from react.prerender import PrerenderedComponents, prerender_components, props_key
+from react.render import render_component, render_components
+from react.render_server import RenderServer, CSRF_TOKEN_PLACEHOLDER
+
+from .helpers import BaseApplicationTest
+from .test_render_server import RenderConfig
+
+
+def test_props_key_ignores_key_order():
+    assert props_key({'a': 1, 'b': 2}) == props_key({'b': 2, 'a': 1})
+    assert props_key(None) == props_key({})
+    assert props_key({'a': 1}) != props_key({'a': 2})
+
+
+class TestPrerender(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestPrerender, self).setup()
+        self.directory = tempfile.mkdtemp()
+        self.flask.config['REACT_RENDER_PRERENDER_DIR'] = self.directory
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def render_callback(self, request):
+        options = json.loads(request.body)
+        return (200, {}, json.dumps({
+            'markup': '<footer>{}</footer>'.format(options['path']),
+            'slug': 'footer',
+            'files': {'footer': 'footer.js'},
+        }))
+
+    def prerender(self, components):
+        responses.add_callback(responses.POST, self.flask.config['REACT_RENDER_URL'], callback=self.render_callback)
+        with self.flask.app_context():
+            return prerender_components(components, self.directory, RenderServer())
+
+    @responses.activate
+    def test_prerender_writes_manifest(self):
+        entries = self.prerender([('/footer.js', {'year': 2016}), ('/header.js', None)])
+
+        assert len(entries) == 2
+        with open(os.path.join(self.directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        assert manifest['components'] == entries
+
+        footer = entries[0]
+        assert footer['path'] == '/footer.js'
+        assert footer['props_key'] == props_key({'year': 2016})
+        assert footer['slug'] == 'footer'
+        assert 'props' not in footer
+        with open(os.path.join(self.directory, footer['markup'])) as f:
+            assert f.read() == '<footer>/footer.js</footer>'
+
+    @responses.activate
+    def test_prerendered_components_are_loaded(self):
+        self.prerender([('/footer.js', {'year': 2016})])
+
+        prerendered = PrerenderedComponents(self.directory)
+        assert len(prerendered) == 1
+        assert prerendered.get('/footer.js', {'year': 2016}).markup == '<footer>/footer.js</footer>'
+        assert prerendered.get('/footer.js', {'year': 2017}) is None
+        assert prerendered.get('/header.js', {'year': 2016}) is None
+
+    @responses.activate
+    def test_prerender_renders_with_csrf_placeholder(self):
+        self.prerender([('/footer.js', {'year': 2016})])
+
+        body = json.loads(responses.calls[0].request.body)
+        assert CSRF_TOKEN_PLACEHOLDER in body['serializedProps']
+
+    @responses.activate
+    def test_prerender_fails_if_component_is_not_rendered(self):
+        self.flask.config['REACT_RENDER'] = False
+
+        with pytest.raises(RenderServerError):
+            self.prerender([('/footer.js', {'year': 2016})])
+        assert not os.path.exists(os.path.join(self.directory, 'manifest.json'))
+
+    @responses.activate
+    def test_prerender_fails_if_breaker_is_open(self):
+        self.flask.config.update({'REACT_RENDER_BREAKER': True})
+        renderer = RenderServer()
+        with self.flask.app_context():
+            renderer.breaker._open()
+
+            with pytest.raises(RenderServerError):
+                prerender_components([('/footer.js', {})], self.directory, renderer)
+
+    def test_missing_manifest_is_empty(self):
+        assert len(PrerenderedComponents(self.directory)) == 0
+
+    @responses.activate
+    @mock.patch('react.render_server.get_csrf_token')
+    def test_prerendered_components_are_served_from_memory(self, get_csrf_token):
+        get_csrf_token.return_value = 'abc123'
+        self.prerender([('/footer.js', {'year': 2016})])
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            component = render_component('/footer.js', {'year': 2016}, to_static_markup=True, renderer=renderer)
+
+            assert len(responses.calls) == 1
+            assert component.render() == '<footer>/footer.js</footer>'
+            assert component.get_bundle() == '/footer.js'
+            assert '"csrf_token": "abc123"' in component.get_props()
+            assert '"location": "/test"' in component.get_props()
+            assert component.stats == {'status': 'prerendered'}
+            assert renderer.metrics.summary()['/footer.js']['statuses'] == {'prerendered': 1}
+
+    @responses.activate
+    def test_other_renders_go_to_render_server(self):
+        self.prerender([('/footer.js', {'year': 2016})])
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            render_component('/footer.js', {'year': 2017}, to_static_markup=True, renderer=renderer)
+            render_component('/footer.js', {'year': 2016}, to_static_markup=False, renderer=renderer)
+
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_prerendered_components_in_batch(self):
+        self.prerender([('/footer.js', {})])
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            header, footer = render_components(
+                [('/header.js', {}), ('/footer.js', {})], to_static_markup=True, renderer=renderer
+            )
+
+        assert len(responses.calls) == 2
+        assert header.render() == '<footer>/header.js</footer>'
+        assert footer.render() == '<footer>/footer.js</footer>'
+        assert footer.stats == {'status': 'prerendered'}
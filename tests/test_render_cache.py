@@ -0,0 +1,132 @@
+import threading
+
+import mock
+
+from react.cache import BackgroundRefresher, RenderCache
+
+
+class TestRenderCache(object):
+    def test_get_missing_key(self):
+        cache = RenderCache()
+        assert cache.get('missing') is None
+        assert cache.stats()['misses'] == 1
+
+    def test_set_and_get(self):
+        cache = RenderCache()
+        cache.set('key', 'value', 5)
+
+        assert cache.get('key') == 'value'
+        assert cache.stats() == {
+            'entries': 1,
+            'bytes': 5,
+            'hits': 1,
+            'stale_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def test_replacing_a_key_updates_size(self):
+        cache = RenderCache()
+        cache.set('key', 'value', 5)
+        cache.set('key', 'other value', 11)
+
+        assert cache.get('key') == 'other value'
+        assert cache.stats()['bytes'] == 11
+        assert len(cache) == 1
+
+    def test_evicts_least_recently_used_over_max_entries(self):
+        cache = RenderCache(max_entries=2)
+        cache.set('a', 1, 1)
+        cache.set('b', 2, 1)
+        cache.get('a')
+        cache.set('c', 3, 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_evicts_over_max_bytes(self):
+        cache = RenderCache(max_bytes=10)
+        cache.set('a', 1, 6)
+        cache.set('b', 2, 6)
+
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        assert cache.stats()['bytes'] == 6
+        assert cache.stats()['evictions'] == 1
+
+    def test_does_not_store_entries_larger_than_max_bytes(self):
+        cache = RenderCache(max_bytes=10)
+        cache.set('a', 1, 11)
+
+        assert cache.get('a') is None
+        assert cache.stats()['evictions'] == 0
+
+    @mock.patch('react.cache.monotonic')
+    def test_entries_expire_after_ttl(self, monotonic):
+        cache = RenderCache(ttl=60)
+        monotonic.return_value = 100
+        cache.set('key', 'value', 5)
+
+        monotonic.return_value = 159
+        assert cache.get('key') == 'value'
+
+        monotonic.return_value = 160
+        assert cache.get('key') is None
+        assert cache.stats()['expirations'] == 1
+        assert cache.stats()['bytes'] == 0
+        assert len(cache) == 0
+
+    @mock.patch('react.cache.monotonic')
+    def test_lookup_returns_stale_entries(self, monotonic):
+        cache = RenderCache(ttl=60, max_stale=30)
+        monotonic.return_value = 100
+        cache.set('key', 'value', 5)
+
+        assert cache.lookup('key') == ('value', False)
+
+        monotonic.return_value = 160
+        assert cache.lookup('key') == ('value', True)
+        assert cache.get('key') is None
+
+        monotonic.return_value = 190
+        assert cache.lookup('key') == (None, False)
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['stale_hits'] == 1
+        assert cache.stats()['misses'] == 2
+        assert cache.stats()['expirations'] == 1
+
+    def test_clear(self):
+        cache = RenderCache()
+        cache.set('key', 'value', 5)
+        cache.clear()
+
+        assert cache.get('key') is None
+        assert cache.stats()['bytes'] == 0
+
+
+class TestBackgroundRefresher(object):
+    def test_refresh(self):
+        refresher = BackgroundRefresher()
+        calls = []
+
+        assert refresher.refresh('key', calls.append, 'value')
+        refresher.shutdown()
+
+        assert calls == ['value']
+        assert refresher.stats() == {'refreshing': 0, 'scheduled': 1, 'skipped': 0}
+
+    def test_skips_keys_already_refreshing_and_refreshes_over_limit(self):
+        refresher = BackgroundRefresher(max_workers=2)
+        release = threading.Event()
+
+        assert refresher.refresh('a', release.wait)
+        assert not refresher.refresh('a', release.wait)
+        assert refresher.refresh('b', release.wait)
+        assert not refresher.refresh('c', release.wait)
+        release.set()
+        refresher.shutdown()
+
+        assert refresher.stats() == {'refreshing': 0, 'scheduled': 2, 'skipped': 2}
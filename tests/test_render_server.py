@@ -1,21 +1,44 @@
 from __future__ import absolute_import, unicode_literals
 
-from mock import patch
+from mock import Mock, patch
+from monotonic import monotonic
 from .helpers import BaseApplicationTest, Config
-from react.render_server import render_server
+from react.render import render_components
+from react.bundles import BundleManifest
+from react.render_server import (
+    render_server, RenderServer, RenderedComponent, CSRF_TOKEN_PLACEHOLDER, endpoint_urls
+)
+from react.signals import component_rendered
+from react.stub_server import StubRenderServer
 from hashlib import sha1
 import pytest
 from react.exceptions import RenderServerError, ReactRenderingError
-from react.response import validate_form_data, from_response
+from react import response
+from react.response import validate_form_data, from_response, parse_key, Field, FormSchema
 from flask import request
 from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import BadRequest
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
 import requests
 import responses
 from six.moves.urllib import parse as urls
 
 
+def wait_for_refreshes(renderer, timeout=5):
+    deadline = monotonic() + timeout
+    while renderer.refresher.stats()['refreshing']:
+        assert monotonic() < deadline, 'timed out waiting for refresh'
+        time.sleep(0.001)
+
+
 class RenderConfig(Config):
     REACT_RENDER = True
+    REACT_RENDER_JSON_BACKEND = 'json'
     REACT_RENDER_URL = 'http://example.com/render'
     SERVER_NAME = 'http://api'
 
@@ -24,18 +47,13 @@ class TestRenderServer(BaseApplicationTest):
     config = RenderConfig()
 
     @responses.activate
-    @patch('react.render_server.hashlib')
     @patch('react.render_server.get_csrf_token')
-    def test_render_server_success(self, get_csrf_token, hashlib):
+    def test_render_server_success(self, get_csrf_token):
         get_csrf_token.return_value = 'abc123'
 
         with self.flask.test_request_context('/test'):
-            sha = sha1()
-            hashlib.sha1.return_value = sha
-
             markup = 'hello world!'
             path = '/widget/component.js'
-            params = {'hash': sha.hexdigest()}
 
             responses.add(responses.POST, render_server.url, json={'markup': markup})
 
@@ -45,13 +63,34 @@ class TestRenderServer(BaseApplicationTest):
             assert len(responses.calls) == 1
             req = responses.calls[0].request
 
+            params = {'hash': sha1(req.body).hexdigest()}
             assert req.url == self.config.REACT_RENDER_URL + '?' + urls.urlencode(params)
             assert req.headers['content-type'] == 'application/json'
-            assert req.body == '{"path": "' + path + '", ''"serializedProps": "{\\"_serverContext\\": ' \
-                '{\\"location\\": \\"/test\\"}, \\"form_options\\": {\\"csrf_token\\": \\"abc123\\"}, ' \
-                '\\"options\\": ' \
-                '{\\"apiUrl\\": \\"http://api\\", \\"serverRender\\": true}}", ' \
-                '"toStaticMarkup": false}'
+            assert req.body == b'{"path": "' + path.encode('utf-8') + b'", "serializedProps": "{\\"_serverContext\\": ' \
+                b'{\\"location\\": \\"/test\\"}, \\"form_options\\": {\\"csrf_token\\": \\"abc123\\"}, ' \
+                b'\\"options\\": ' \
+                b'{\\"apiUrl\\": \\"http://api\\", \\"serverRender\\": true}}", ' \
+                b'"toStaticMarkup": false}'
+
+    @responses.activate
+    @patch('react.render_server.get_csrf_token')
+    def test_inline_props(self, get_csrf_token):
+        get_csrf_token.return_value = 'abc123'
+        self.flask.config.update({'REACT_RENDER_INLINE_PROPS': True})
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+
+            result = render_server.render('/widget/component.js', to_static_markup=True)
+            assert result.render() == 'hello'
+
+            req = responses.calls[0].request
+            assert json.loads(req.body.decode('utf-8')) == {
+                'path': '/widget/component.js',
+                'props': json.loads(result.get_props()),
+                'toStaticMarkup': True,
+            }
+            assert req.url.endswith('?hash=' + sha1(req.body).hexdigest())
 
     @responses.activate
     @patch('react.render_server.get_csrf_token')
@@ -80,6 +119,436 @@ class TestRenderServer(BaseApplicationTest):
             with pytest.raises(RenderServerError):
                 render_server.render('/path')
 
+    @responses.activate
+    def test_timeout(self):
+        e = requests.exceptions.ReadTimeout('mock timeout!')
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, body=e)
+
+            with pytest.raises(RenderServerError) as excinfo:
+                render_server.render('/path')
+            assert 'Timed out' in str(excinfo.value)
+
+    def test_transport_is_shared_between_renders(self):
+        with self.flask.test_request_context('/test'):
+            assert render_server.transport is render_server.transport
+
+    def test_transport_config(self):
+        self.flask.config.update({
+            'REACT_RENDER_POOL_SIZE': 3,
+            'REACT_RENDER_KEEP_ALIVE': False,
+            'REACT_RENDER_CONNECT_TIMEOUT': '0.5',
+            'REACT_RENDER_TIMEOUT': 2,
+        })
+
+        with self.flask.test_request_context('/test'):
+            transport = render_server.transport
+            assert transport.pool_size == 3
+            assert transport.session.get_adapter('http://example.com')._pool_maxsize == 3
+            assert transport.session.headers['Connection'] == 'close'
+            assert render_server.timeout == (0.5, 2.0)
+
+    def test_default_timeout_is_unset(self):
+        with self.flask.test_request_context('/test'):
+            assert render_server.timeout == (None, None)
+
+    def test_render_against_stub_server(self):
+        renderer = RenderServer()
+
+        with StubRenderServer() as server:
+            self.flask.config['REACT_RENDER_URL'] = server.url
+            with self.flask.test_request_context('/test'):
+                first = renderer.render('/widget/component.js')
+                second = renderer.render('/widget/other.js')
+                assert first.get_bundle() == '/main.js'
+
+        assert first.render() == '<div data-path="/widget/component.js"></div>'
+        assert second.render() == '<div data-path="/widget/other.js"></div>'
+        renderer.transports.close()
+
+    @responses.activate
+    def test_bundle_urls(self):
+        self.flask.config['REACT_BUNDLE_URL'] = '/static/'
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={
+                'markup': 'hello', 'slug': 'widget', 'files': {'widget': 'widget.1.js', 'vendor': 'vendor.2.js'}
+            })
+            first = render_server.render('/widget.js')
+            second = render_server.render('/widget.js')
+
+        assert first.get_bundle() == '/static/widget.1.js'
+        assert first.get_vendor_bundle() == '/static/vendor.2.js'
+        assert first.get_file('vendor') == '/static/vendor.2.js'
+        assert first.get_file('missing') is None
+        assert first.files == {'widget': 'widget.1.js', 'vendor': 'vendor.2.js'}
+        # Components rendered with the same files share them
+        assert second.bundles is first.bundles
+
+    def test_component_can_be_made_outside_of_an_app_context(self):
+        component = RenderedComponent('hello', '{}', 'widget', {'widget': 'widget.1.js'})
+        manifest = BundleManifest({'widget': 'widget.1.js'}, '/static/')
+
+        assert component.render() == 'hello'
+        assert RenderedComponent('hello', '{}', 'widget', manifest).get_bundle() == '/static/widget.1.js'
+
+        self.flask.config['REACT_BUNDLE_URL'] = '/static/'
+        with self.flask.app_context():
+            assert component.get_bundle() == '/static/widget.1.js'
+
+    def test_render_over_unix_socket(self):
+        renderer = RenderServer()
+        socket_dir = tempfile.mkdtemp()
+
+        try:
+            with StubRenderServer(unix_socket=os.path.join(socket_dir, 'render.sock')) as server:
+                self.flask.config['REACT_RENDER_URL'] = server.url
+                with self.flask.test_request_context('/test'):
+                    result = renderer.render('/widget/component.js')
+                    assert result.get_bundle() == '/main.js'
+
+            assert result.render() == '<div data-path="/widget/component.js"></div>'
+        finally:
+            renderer.transports.close()
+            shutil.rmtree(socket_dir)
+
+    def test_missing_unix_socket(self):
+        socket_dir = tempfile.mkdtemp()
+        self.flask.config['REACT_RENDER_URL'] = 'unix://' + os.path.join(socket_dir, 'render.sock')
+
+        try:
+            with self.flask.test_request_context('/test'):
+                with pytest.raises(RenderServerError):
+                    render_server.render('/path')
+        finally:
+            shutil.rmtree(socket_dir)
+
+    @responses.activate
+    def test_cache_disabled_by_default(self):
+        with self.flask.test_request_context('/test'):
+            assert render_server.cache is None
+
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+            render_server.render('/path')
+            render_server.render('/path')
+
+            assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_cache_reuses_identical_renders(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={
+                'markup': 'hello', 'slug': 'widget', 'files': {'widget': 'widget.js'}
+            })
+
+            first = renderer.render('/path', {'foo': 'bar'})
+            second = renderer.render('/path', {'foo': 'bar'})
+            third = renderer.render('/path', {'foo': 'baz'})
+
+            assert len(responses.calls) == 2
+            assert second.render() == first.render() == 'hello'
+            assert second.get_props() == first.get_props()
+            assert second.get_bundle() == '/widget.js'
+            assert third.get_props() != first.get_props()
+            assert renderer.cache.stats()['hits'] == 1
+            assert renderer.cache.stats()['misses'] == 2
+
+    @responses.activate
+    def test_cache_is_keyed_on_request_headers(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+
+            renderer.render('/path', {'foo': 'bar'}, request_headers={'cookie': 'session=a'})
+            renderer.render('/path', {'foo': 'bar'}, request_headers={'cookie': 'session=b'})
+            renderer.render('/path', {'foo': 'bar'}, request_headers={'cookie': 'session=a'})
+
+            assert len(responses.calls) == 2
+            assert responses.calls[1].request.headers['cookie'] == 'session=b'
+            assert renderer.cache.stats()['hits'] == 1
+
+    def test_cache_config(self):
+        self.flask.config.update({
+            'REACT_RENDER_CACHE': True,
+            'REACT_RENDER_CACHE_MAX_ENTRIES': 10,
+            'REACT_RENDER_CACHE_MAX_BYTES': 1024,
+            'REACT_RENDER_CACHE_TTL': 30,
+            'REACT_RENDER_CACHE_MAX_STALE': 60,
+        })
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            assert renderer.cache is renderer.cache
+            assert renderer.cache.settings == (10, 1024, 30, 60)
+
+    @responses.activate
+    @patch('react.cache.monotonic')
+    def test_stale_renders_are_served_and_refreshed(self, monotonic):
+        self.flask.config.update({
+            'REACT_RENDER_CACHE': True, 'REACT_RENDER_CACHE_TTL': 30, 'REACT_RENDER_CACHE_MAX_STALE': 60
+        })
+        renderer = RenderServer()
+        monotonic.return_value = 100
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'first'})
+            responses.add(responses.POST, render_server.url, json={'markup': 'second'})
+
+            assert renderer.render('/path').render() == 'first'
+
+            monotonic.return_value = 140
+            assert renderer.render('/path').render() == 'first'
+            wait_for_refreshes(renderer)
+
+            assert len(responses.calls) == 2
+            assert renderer.refresher.stats()['scheduled'] == 1
+            assert renderer.render('/path').render() == 'second'
+            assert renderer.cache.stats()['stale_hits'] == 1
+
+    @responses.activate
+    @patch('react.cache.monotonic')
+    def test_failed_refresh_keeps_serving_stale_render(self, monotonic):
+        self.flask.config.update({
+            'REACT_RENDER_CACHE': True, 'REACT_RENDER_CACHE_TTL': 30, 'REACT_RENDER_CACHE_MAX_STALE': 60
+        })
+        renderer = RenderServer()
+        monotonic.return_value = 100
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'first'})
+            responses.add(responses.POST, render_server.url, status=500)
+
+            renderer.render('/path')
+            monotonic.return_value = 140
+            renderer.render('/path')
+            wait_for_refreshes(renderer)
+
+            assert len(responses.calls) == 2
+            assert renderer.render('/path').render() == 'first'
+
+    @responses.activate
+    def test_failed_renders_are_not_cached(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'error': 'an error'})
+
+            for _ in range(2):
+                with pytest.raises(ReactRenderingError):
+                    renderer.render('/path')
+
+            assert len(renderer.cache) == 0
+
+    @responses.activate
+    @patch('react.render_server.get_csrf_token')
+    def test_csrf_placeholder_shares_cached_renders_between_sessions(self, get_csrf_token):
+        self.flask.config.update({'REACT_RENDER_CACHE': True, 'REACT_RENDER_CSRF_PLACEHOLDER': True})
+        renderer = RenderServer()
+        markup = '<input name="csrf_token" value="{}">'.format(CSRF_TOKEN_PLACEHOLDER)
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': markup})
+
+            get_csrf_token.return_value = 'abc123'
+            first = renderer.render('/path')
+            get_csrf_token.return_value = 'def456'
+            props = {}
+            second = renderer.render('/path', props)
+
+            assert len(responses.calls) == 1
+            assert CSRF_TOKEN_PLACEHOLDER.encode('utf-8') in responses.calls[0].request.body
+            assert b'abc123' not in responses.calls[0].request.body
+
+            assert first.render() == '<input name="csrf_token" value="abc123">'
+            assert '"csrf_token": "abc123"' in first.get_props()
+            assert second.render() == '<input name="csrf_token" value="def456">'
+            assert '"csrf_token": "def456"' in second.get_props()
+            assert CSRF_TOKEN_PLACEHOLDER not in second.get_props()
+            assert props['form_options']['csrf_token'] == 'def456'
+
+    @responses.activate
+    @patch('react.render_server.get_csrf_token')
+    def test_csrf_placeholder_with_react_render_not_set(self, get_csrf_token):
+        get_csrf_token.return_value = 'abc123'
+        self.flask.config.update({'REACT_RENDER': None, 'REACT_RENDER_CSRF_PLACEHOLDER': True})
+
+        with self.flask.test_request_context('/test'):
+            result = render_server.render('/widget/component.js')
+            assert result.render() == ''
+            assert '"csrf_token": "abc123"' in result.get_props()
+
+    @responses.activate
+    def test_coalesced_renders_go_through_single_flight(self):
+        self.flask.config.update({'REACT_RENDER_COALESCE': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+
+            assert renderer.render('/path').render() == 'hello'
+            assert renderer.in_flight.stats()['calls'] == 1
+
+    @responses.activate
+    def test_coalesced_render_errors_are_raised(self):
+        self.flask.config.update({'REACT_RENDER_COALESCE': True})
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'error': 'an error'})
+
+            with pytest.raises(ReactRenderingError):
+                render_server.render('/path')
+
+    @responses.activate
+    def test_open_breaker_falls_back_to_client_side_render(self):
+        self.flask.config.update({'REACT_RENDER_BREAKER': True, 'REACT_RENDER_BREAKER_MIN_REQUESTS': 2})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, status=500)
+
+            for _ in range(2):
+                with pytest.raises(RenderServerError):
+                    renderer.render('/path')
+
+            result = renderer.render('/path', {'foo': 'bar'})
+
+            assert len(responses.calls) == 2
+            assert result.render() == ''
+            assert '"foo": "bar"' in result.get_props()
+            assert renderer.breaker.stats()['state'] == 'open'
+
+    @responses.activate
+    def test_rendering_errors_do_not_open_breaker(self):
+        self.flask.config.update({'REACT_RENDER_BREAKER': True, 'REACT_RENDER_BREAKER_MIN_REQUESTS': 1})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'error': 'an error'})
+
+            with pytest.raises(ReactRenderingError):
+                renderer.render('/path')
+
+            assert renderer.breaker.stats()['state'] == 'closed'
+
+    @responses.activate
+    def test_breaker_trial_failing_with_any_exception_reopens_breaker(self):
+        self.flask.config.update({
+            'REACT_RENDER_BREAKER': True, 'REACT_RENDER_BREAKER_MIN_REQUESTS': 1, 'REACT_RENDER_BREAKER_RESET_TIMEOUT': 0,
+        })
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, status=500)
+            with pytest.raises(RenderServerError):
+                renderer.render('/path')
+            assert renderer.breaker.stats()['state'] == 'open'
+
+            with patch.object(renderer, '_post', side_effect=RuntimeError('oops')):
+                with pytest.raises(RuntimeError):
+                    renderer.render('/path')
+            assert renderer.breaker.stats()['state'] == 'open'
+
+            responses.reset()
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+            result = renderer.render('/path')
+
+            assert result.render() == 'hello'
+            assert renderer.breaker.stats()['state'] == 'closed'
+
+    @responses.activate
+    def test_request_errors_are_render_server_errors(self):
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, body=requests.exceptions.ChunkedEncodingError('broken'))
+
+            with pytest.raises(RenderServerError) as e:
+                render_server.render('/path')
+            assert 'broken' in str(e.value)
+
+    def test_breaker_disabled_by_default(self):
+        with self.flask.test_request_context('/test'):
+            assert render_server.breaker is None
+
+    def test_latency_budget_limits_timeout(self):
+        self.flask.config.update({'REACT_RENDER_LATENCY_BUDGET': 0.5, 'REACT_RENDER_TIMEOUT': 2})
+
+        with self.flask.test_request_context('/test'):
+            assert render_server.timeout == (None, 0.5)
+
+            self.flask.config.update({'REACT_RENDER_TIMEOUT': 0.25})
+            assert render_server.timeout == (None, 0.25)
+
+    @responses.activate
+    def test_compressed_request(self):
+        self.flask.config.update({'REACT_RENDER_COMPRESS': True, 'REACT_RENDER_COMPRESS_MIN_BYTES': 100})
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+
+            result = render_server.render('/path', {'items': ['item'] * 100})
+
+            req = responses.calls[0].request
+            body = zlib.decompress(req.body, 16 + zlib.MAX_WBITS)
+            assert req.headers['content-encoding'] == 'gzip'
+            assert json.loads(body.decode('utf-8'))['path'] == '/path'
+            assert req.url.endswith('?hash=' + sha1(body).hexdigest())
+
+            assert result.render() == 'hello'
+            assert result.stats['request_bytes'] == len(body)
+            assert result.stats['request_compressed_bytes'] == len(req.body)
+            assert result.stats['request_compression_ratio'] < 0.5
+            assert result.stats['compression_time'] >= 0
+
+    @responses.activate
+    def test_small_requests_are_not_compressed(self):
+        self.flask.config.update({'REACT_RENDER_COMPRESS': True, 'REACT_RENDER_COMPRESS_MIN_BYTES': 10000})
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+
+            result = render_server.render('/path')
+
+            req = responses.calls[0].request
+            assert 'content-encoding' not in req.headers
+            assert json.loads(req.body.decode('utf-8'))['path'] == '/path'
+            assert 'request_compressed_bytes' not in result.stats
+
+    @responses.activate
+    def test_compressed_response(self):
+        body = json.dumps({'markup': '<p>hello</p>' * 100}).encode('utf-8')
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compressed = compressor.compress(body) + compressor.flush()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, body=compressed, headers={
+                'content-encoding': 'gzip', 'content-length': str(len(compressed))
+            })
+
+            result = render_server.render('/path')
+
+            assert result.render() == '<p>hello</p>' * 100
+            assert result.stats['response_bytes'] == len(body)
+            assert result.stats['response_compressed_bytes'] == len(compressed)
+            assert result.stats['response_compression_ratio'] < 0.5
+
+    def test_compressed_request_to_stub_server(self):
+        self.flask.config.update({'REACT_RENDER_COMPRESS': True, 'REACT_RENDER_COMPRESS_MIN_BYTES': 0})
+        renderer = RenderServer()
+
+        with StubRenderServer() as server:
+            self.flask.config['REACT_RENDER_URL'] = server.url
+            with self.flask.test_request_context('/test'):
+                result = renderer.render('/widget/component.js')
+
+        assert result.render() == '<div data-path="/widget/component.js"></div>'
+        renderer.transports.close()
+
     @responses.activate
     def test_non_200_status_code(self):
         with self.flask.test_request_context('/test'):
@@ -105,6 +574,292 @@ class TestRenderServer(BaseApplicationTest):
                 render_server.render('/path')
 
 
+class TestRenderServerEndpoints(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestRenderServerEndpoints, self).setup()
+        self.renderer = RenderServer()
+        self.servers = []
+
+    def teardown(self):
+        self.renderer.transports.close()
+        for server in self.servers:
+            server.stop()
+
+    def start_servers(self, *delays):
+        self.servers = [StubRenderServer(delay=delay).start() for delay in delays]
+        self.flask.config['REACT_RENDER_URL'] = [server.url for server in self.servers]
+
+    def test_endpoint_urls(self):
+        assert endpoint_urls('http://a/render') == ['http://a/render']
+        assert endpoint_urls('http://a/render, http://b/render,') == ['http://a/render', 'http://b/render']
+        assert endpoint_urls(('http://a/render', 'http://b/render')) == ['http://a/render', 'http://b/render']
+
+    def test_renders_are_spread_over_endpoints(self):
+        self.start_servers(0, 0)
+
+        with self.flask.test_request_context('/test'):
+            for _ in range(4):
+                assert self.renderer.render('/path').render() == '<div data-path="/path"></div>'
+
+            balancer = self.renderer.balancer(endpoint_urls(self.flask.config['REACT_RENDER_URL']))
+            assert balancer.latency_percentile(0, min_samples=4) is not None
+            assert all(stats['outstanding'] == 0 for stats in balancer.stats()['endpoints'].values())
+
+    def test_failing_endpoint_is_avoided(self):
+        self.start_servers(0)
+        self.flask.config['REACT_RENDER_URL'] = [self.servers[0].url, 'http://127.0.0.1:1/render']
+        self.flask.config['REACT_RENDER_ENDPOINT_FAILURES'] = 1
+
+        with self.flask.test_request_context('/test'):
+            results = []
+            for _ in range(4):
+                try:
+                    results.append(self.renderer.render('/path').render())
+                except RenderServerError:
+                    results.append(None)
+
+        assert results.count(None) == 1
+
+    def test_hedged_request_to_second_endpoint(self):
+        self.start_servers(1, 0)
+        self.flask.config.update({'REACT_RENDER_HEDGE': True, 'REACT_RENDER_HEDGE_MIN_SAMPLES': 1})
+
+        with self.flask.test_request_context('/test'):
+            balancer = self.renderer.balancer(endpoint_urls(self.flask.config['REACT_RENDER_URL']))
+            slow, fast = balancer.endpoints
+            balancer.release(balancer.acquire(), 0.01)
+            # Make sure the slow server gets the first request
+            fast.outstanding += 1
+
+            start = monotonic()
+            result = self.renderer.render('/path')
+            elapsed = monotonic() - start
+            fast.outstanding -= 1
+
+        assert result.render() == '<div data-path="/path"></div>'
+        assert elapsed < 0.5
+        assert balancer.stats()['hedged'] == 1
+
+    def test_no_hedging_while_hedge_pool_is_busy(self):
+        self.start_servers(0.3, 0)
+        self.flask.config.update({
+            'REACT_RENDER_HEDGE': True, 'REACT_RENDER_HEDGE_MIN_SAMPLES': 1, 'REACT_RENDER_HEDGE_WORKERS': 1,
+        })
+
+        with self.flask.test_request_context('/test'):
+            balancer = self.renderer.balancer(endpoint_urls(self.flask.config['REACT_RENDER_URL']))
+            slow, fast = balancer.endpoints
+            balancer.release(balancer.acquire(), 0.01)
+            fast.outstanding += 1
+
+            self.renderer.hedge_executor
+            assert self.renderer._hedge_slots.acquire(False)
+            with patch.object(self.renderer.hedge_executor, 'submit') as submit:
+                start = monotonic()
+                result = self.renderer.render('/path')
+                elapsed = monotonic() - start
+            self.renderer._hedge_slots.release()
+            fast.outstanding -= 1
+
+        assert result.render() == '<div data-path="/path"></div>'
+        assert elapsed >= 0.3
+        assert not submit.called
+        assert balancer.stats()['hedged'] == 0
+        assert slow.outstanding == 0
+
+    def test_endpoint_is_released_when_send_fails_with_any_exception(self):
+        with self.flask.test_request_context('/test'):
+            balancer = self.renderer.balancer(['http://a/render', 'http://b/render'])
+            endpoint = balancer.acquire()
+
+            with pytest.raises(RuntimeError):
+                self.renderer._send_to_endpoint(balancer, endpoint, Mock(side_effect=RuntimeError('oops')))
+
+        assert endpoint.outstanding == 0
+        assert endpoint.failures == 1
+
+    def test_no_hedging_without_latency_samples(self):
+        self.start_servers(0, 0)
+        self.flask.config.update({'REACT_RENDER_HEDGE': True})
+
+        with self.flask.test_request_context('/test'):
+            with patch.object(RenderServer, 'hedge_executor') as hedge_executor:
+                self.renderer.render('/path')
+
+            assert not hedge_executor.submit.called
+
+
+class TestRenderComponents(BaseApplicationTest):
+    config = RenderConfig()
+
+    def render_callback(self, request):
+        path = json.loads(request.body)['path']
+        if path == '/broken.js':
+            return (500, {}, 'render server exploded')
+        return (200, {}, json.dumps({'markup': 'rendered ' + path}))
+
+    @responses.activate
+    def test_renders_components_in_order(self):
+        with self.flask.test_request_context('/test'):
+            responses.add_callback(responses.POST, render_server.url, callback=self.render_callback)
+
+            results = render_components([
+                ('/first.js', {'foo': 'bar'}),
+                ('/second.js', None),
+                ('/third.js', {}),
+            ])
+
+            assert [result.render() for result in results] == [
+                'rendered /first.js', 'rendered /second.js', 'rendered /third.js'
+            ]
+            assert all(result.error is None for result in results)
+            assert '"foo": "bar"' in results[0].get_props()
+            assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_failures_are_reported_per_component(self):
+        with self.flask.test_request_context('/test'):
+            responses.add_callback(responses.POST, render_server.url, callback=self.render_callback)
+
+            first, broken, last = render_components([
+                ('/first.js', {}),
+                ('/broken.js', {'foo': 'bar'}),
+                ('/last.js', {}),
+            ])
+
+            assert first.render() == 'rendered /first.js'
+            assert last.render() == 'rendered /last.js'
+            assert broken.render() == ''
+            assert '"foo": "bar"' in broken.get_props()
+            assert isinstance(broken.error, RenderServerError)
+
+    @responses.activate
+    def test_single_component_is_rendered_inline(self):
+        with self.flask.test_request_context('/test'):
+            responses.add_callback(responses.POST, render_server.url, callback=self.render_callback)
+
+            with patch.object(render_server.executor, 'submit') as submit:
+                results = render_components([('/first.js', {})])
+
+            assert not submit.called
+            assert results[0].render() == 'rendered /first.js'
+
+    @patch('react.render_server.get_csrf_token')
+    def test_react_render_not_set(self, get_csrf_token):
+        get_csrf_token.return_value = 'abc123'
+        self.flask.config.update({'REACT_RENDER': None, 'REACT_RENDER_CSRF_PLACEHOLDER': True})
+
+        with self.flask.test_request_context('/test'):
+            results = render_components([('/first.js', {}), ('/second.js', {})])
+
+            assert [result.render() for result in results] == ['', '']
+            assert all('"csrf_token": "abc123"' in result.get_props() for result in results)
+
+
+class TestRenderMetrics(BaseApplicationTest):
+    config = RenderConfig()
+
+    def setup(self):
+        super(TestRenderMetrics, self).setup()
+        self.renders = []
+        component_rendered.connect(self.on_render)
+
+    def teardown(self):
+        component_rendered.disconnect(self.on_render)
+
+    def on_render(self, sender, path, stats):
+        self.renders.append((sender, path, stats))
+
+    @responses.activate
+    def test_render_is_recorded(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+            renderer.render('/widget.js', {'foo': 'bar'})
+            summary = renderer.metrics.summary()['/widget.js']
+
+        (sender, path, stats), = self.renders
+        assert sender is renderer
+        assert path == '/widget.js'
+        assert stats['status'] == 'rendered'
+        assert stats['error'] is None
+        assert stats['request_bytes'] == len(responses.calls[0].request.body)
+        assert stats['response_bytes'] == len(responses.calls[0].response.content)
+        assert stats['time'] >= stats['serialization_time'] > 0
+
+        assert summary['count'] == 1
+        assert summary['statuses'] == {'rendered': 1}
+        assert summary['response_bytes'] == {'p50': stats['response_bytes'], 'p95': stats['response_bytes'],
+                                             'p99': stats['response_bytes']}
+
+    @responses.activate
+    def test_failed_render_is_recorded(self):
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, status=500)
+            with pytest.raises(RenderServerError):
+                renderer.render('/widget.js')
+            summary = renderer.metrics.summary()['/widget.js']
+
+        (_, path, stats), = self.renders
+        assert stats['status'] == 'error'
+        assert stats['error'] == 'RenderServerError'
+        assert summary['errors'] == {'RenderServerError': 1}
+
+    @responses.activate
+    def test_cached_render_is_recorded(self):
+        self.flask.config.update({'REACT_RENDER_CACHE': True})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            responses.add(responses.POST, render_server.url, json={'markup': 'hello'})
+            renderer.render('/widget.js')
+            renderer.render('/widget.js')
+
+        assert [stats['status'] for _, _, stats in self.renders] == ['rendered', 'cached']
+        assert self.renders[1][2]['response_bytes'] is None
+
+    def test_react_render_not_set(self):
+        self.flask.config.update({'REACT_RENDER': None})
+        renderer = RenderServer()
+
+        with self.flask.test_request_context('/test'):
+            renderer.render('/widget.js')
+            assert renderer.metrics.summary()['/widget.js']['statuses'] == {'disabled': 1}
+
+    @responses.activate
+    def test_each_component_is_recorded(self):
+        renderer = RenderServer()
+
+        def render_callback(request):
+            path = json.loads(request.body)['path']
+            if path == '/broken.js':
+                return (200, {}, json.dumps({'error': 'broken'}))
+            return (200, {}, json.dumps({'markup': 'rendered ' + path}))
+
+        with self.flask.test_request_context('/test'):
+            responses.add_callback(responses.POST, render_server.url, callback=render_callback)
+            renderer.render_many([('/first.js', {}), ('/broken.js', {}), ('/first.js', {})])
+            summary = renderer.metrics.summary()
+
+        assert summary['/first.js']['statuses'] == {'rendered': 2}
+        assert summary['/broken.js']['errors'] == {'ReactRenderingError': 1}
+        assert len(self.renders) == 3
+
+    def test_metrics_window_config(self):
+        self.flask.config.update({'REACT_RENDER_METRICS_WINDOW': 10})
+        renderer = RenderServer()
+
+        with self.flask.app_context():
+            metrics = renderer.metrics
+            assert metrics.window == 10
+            assert renderer.metrics is metrics
+
+
 class TestReactResponse(BaseApplicationTest):
     def test_extract_json_response(self):
         data = MultiDict([('a', '1'), ('b[]', '2'), ('b[]', '3'), ("c.d", '4')])
@@ -135,6 +890,48 @@ class TestReactResponse(BaseApplicationTest):
             assert 'd' in response_data['c']
             assert response_data['c']['d'] == '4'
 
+    def test_extract_nested_form_response(self):
+        data = MultiDict([
+            ('a.b.c[]', '1'), ('a.b.c[]', '2'),
+            ('a.b.d', ' 3 '),
+            ('items[0].name', 'first'), ('items[1].name', 'second'), ('items[1].tags[]', 'x'),
+            ('matrix[1][0]', '4'),
+            ('csrf_token', 'abc123'),
+        ])
+        with self.flask.test_request_context('/test', method='POST', data=data):
+            assert from_response(request) == {
+                'a': {'b': {'c': ['1', '2'], 'd': '3'}},
+                'items': [{'name': 'first'}, {'name': 'second', 'tags': ['x']}],
+                'matrix': [None, ['4']],
+            }
+
+    def test_repeated_field_without_list_marker(self):
+        data = MultiDict([('a.b', '1'), ('a.b', '2')])
+        with self.flask.test_request_context('/test', method='POST', data=data):
+            assert from_response(request) == {'a': {'b': ['1', '2']}}
+
+    def test_clashing_fields(self):
+        data = MultiDict([('a', '1'), ('a.b', '2')])
+        with self.flask.test_request_context('/test', method='POST', data=data):
+            assert from_response(request) == {'a': {'b': '2'}}
+
+    def test_list_index_too_large(self):
+        data = MultiDict([('a[100000]', '1')])
+        with self.flask.test_request_context('/test', method='POST', data=data):
+            with pytest.raises(BadRequest):
+                from_response(request)
+
+    @pytest.mark.parametrize('key,parsed', [
+        ('a', (('a',), False)),
+        ('a[]', (('a',), True)),
+        ('a.b.c[]', (('a', 'b', 'c'), True)),
+        ('a[2].b', (('a', 2, 'b'), False)),
+        ('a[b]', (('a', 'b'), False)),
+        ('[]', ((), True)),
+    ])
+    def test_parse_key(self, key, parsed):
+        assert parse_key(key) == parsed
+
     def test_valid_form(self):
         data = {'key1': 'value1', 'key2': 'value2'}
         required_fields = ['key1', 'key2']
@@ -152,3 +949,88 @@ class TestReactResponse(BaseApplicationTest):
         assert errors['key2'] == {"required": True}
         assert 'key1' in min_errors
         assert min_errors['key1'] == {"min": True}
+
+
+class TestFormSchema(object):
+    schema = FormSchema([
+        Field('name', required=True, min_length=2, max_length=10),
+        Field('contact.email', required=True, pattern=r'[^@]+@[^@]+'),
+        Field('contact.phone', pattern=r'[0-9 ]+'),
+        Field('items[].name', required=True),
+        Field('tags', min_length=1, max_length=2, pattern=r'[a-z]+'),
+    ])
+
+    def test_valid(self):
+        assert self.schema.validate({
+            'name': 'Someone',
+            'contact': {'email': 'someone@example.com'},
+            'items': [{'name': 'first'}, {'name': 'second'}],
+            'tags': ['a', 'b'],
+        }) == {}
+
+    def test_collects_all_errors(self):
+        assert self.schema.validate({
+            'name': 'S',
+            'contact': {'email': 'someone', 'phone': 'call me'},
+            'items': [{'name': 'first'}, {'name': ''}, {}],
+            'tags': ['a', 'B', 'c'],
+        }) == {
+            'name': {'min': True},
+            'contact.email': {'pattern': True},
+            'contact.phone': {'pattern': True},
+            'items[1].name': {'required': True},
+            'items[2].name': {'required': True},
+            'tags': {'max': True, 'pattern': True},
+        }
+
+    def test_missing_fields(self):
+        assert self.schema.validate({'contact': 'not a dict'}) == {
+            'name': {'required': True},
+            'contact.email': {'required': True},
+        }
+
+    def test_length_checks(self):
+        schema = FormSchema([Field('a', min_length=2, max_length=3), Field('b', max_length=1), Field('c')])
+        assert schema.validate({'a': 'abc', 'b': ['x'], 'c': 'anything'}) == {}
+        assert schema.validate({'a': 'abcd', 'b': ['x', 'y']}) == {'a': {'max': True}, 'b': {'max': True}}
+        assert schema.validate({'a': 'a', 'b': 1}) == {'a': {'min': True}}
+
+    def test_pattern_must_match_whole_value(self):
+        schema = FormSchema([Field('code', pattern=r'[0-9]+')])
+        assert schema.validate({'code': '123'}) == {}
+        assert schema.validate({'code': '123a'}) == {'code': {'pattern': True}}
+
+    def test_indexed_path(self):
+        schema = FormSchema([Field('items[0].name', required=True)])
+        assert schema.validate({'items': [{'name': 'first'}]}) == {}
+        assert schema.validate({'items': []}) == {'items[0].name': {'required': True}}
+
+    def test_validate_many(self):
+        assert self.schema.validate_many([
+            {'name': 'Someone', 'contact': {'email': 'someone@example.com'}},
+            {'name': 'Someone'},
+        ]) == [{}, {'contact.email': {'required': True}}]
+
+    @pytest.mark.parametrize('data, errors', [
+        ({'key1': 'value1', 'key2': 'value2'}, {}),
+        ({'key1': 'value1', 'key2': 'v'}, {'key2': {'min': True}}),
+        ({'key1': 'value1'}, {'key2': {'required': True}}),
+        ({'key1': 'v', 'key2': ['']}, {'key2': {'required': True}}),
+        ({}, {'key1': {'required': True}, 'key2': {'required': True}}),
+    ])
+    def test_from_required_fields(self, data, errors):
+        schema = FormSchema.from_required_fields(['key1', ('key2', 5)])
+        assert schema.validate(data) == errors
+
+    def test_simple_and_other_fields_keep_their_order(self):
+        schema = FormSchema([
+            Field('a', required=True), Field('a', max_length=1), Field('b', required=True, min_length=2),
+        ])
+        assert schema.validate({'a': 'abc', 'b': 'b'}) == {'a': {'max': True}, 'b': {'min': True}}
+
+    def test_validate_form_data_reuses_schemas(self):
+        required_fields = ['key1', ('key2', 5)]
+        validate_form_data({}, required_fields)
+        schema = response._required_field_schemas[tuple(required_fields)]
+        assert validate_form_data({}, list(required_fields)) == schema.validate({})
+        assert response._required_field_schemas[tuple(required_fields)] is schema
@@ -0,0 +1,81 @@
+# coding=utf-8
+from __future__ import unicode_literals
+
+import json
+from datetime import datetime
+from hashlib import sha1
+
+import pytest
+from flask.json import JSONEncoder
+
+from react.serialization import dumps_props, serialize_options
+
+PROPS = {
+    'title': 'Ralph’s "quoted" <brief>\n',
+    'count': 3,
+    'items': [{'b': 1, 'a': None}, True],
+    'nested': {'z': 1.5, 'a': []},
+}
+
+
+def test_dumps_props_with_stdlib_backend():
+    assert dumps_props(PROPS, backend='json') == json.dumps(PROPS, cls=JSONEncoder, sort_keys=True)
+
+
+def test_dumps_props_uses_stdlib_backend_by_default():
+    # Even if orjson is installed
+    assert dumps_props(PROPS) == json.dumps(PROPS, cls=JSONEncoder, sort_keys=True)
+
+
+@pytest.mark.parametrize('to_static_markup', [True, False])
+def test_serialize_options_matches_json_dumps(to_static_markup):
+    serialized_props = json.dumps(PROPS, sort_keys=True)
+    body, options_hash = serialize_options('/widget/ünïcode.js', serialized_props, to_static_markup)
+
+    expected = json.dumps({
+        'path': '/widget/ünïcode.js',
+        'serializedProps': serialized_props,
+        'toStaticMarkup': to_static_markup,
+    }, sort_keys=True).encode('utf-8')
+
+    assert body == expected
+    assert options_hash == sha1(expected).hexdigest()
+
+
+def test_serialize_options_with_inline_props():
+    serialized_props = dumps_props(PROPS, backend='json')
+    body, options_hash = serialize_options('/widget.js', serialized_props, False, inline_props=True)
+
+    assert json.loads(body.decode('utf-8')) == {
+        'path': '/widget.js',
+        'props': PROPS,
+        'toStaticMarkup': False,
+    }
+    assert options_hash == sha1(body).hexdigest()
+
+
+class TestOrjsonBackend(object):
+    def setup(self):
+        pytest.importorskip('orjson')
+
+    def test_produces_equivalent_json(self):
+        serialized = dumps_props(PROPS, backend='auto')
+
+        assert json.loads(serialized) == PROPS
+        assert [key for key, _ in json.loads(serialized, object_pairs_hook=list)] == sorted(PROPS)
+
+    def test_uses_flask_encoder_for_datetimes(self):
+        props = {'date': datetime(2018, 1, 2, 3, 4, 5)}
+
+        assert json.loads(dumps_props(props, backend='auto')) == json.loads(dumps_props(props, backend='json'))
+
+    def test_allows_non_string_keys(self):
+        props = {2: 'b', 1: 'a'}
+
+        assert dumps_props(props, backend='auto') == '{"1":"a","2":"b"}'
+
+    def test_escapes_line_and_paragraph_separators(self):
+        serialized = dumps_props({'text': 'a\u2028b\u2029c'}, backend='auto')
+
+        assert serialized == '{"text":"a\\u2028b\\u2029c"}'
+        assert json.loads(serialized) == {'text': 'a\u2028b\u2029c'}
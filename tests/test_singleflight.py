@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from react.singleflight import SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+class TestSingleFlight(object):
+    def run_concurrently(self, flight, fn, callers):
+        results = [None] * callers
+
+        def call(i):
+            try:
+                results[i] = flight.do('key', fn)
+            except BaseException as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+        for thread in threads:
+            thread.start()
+
+        return threads, results
+
+    def test_returns_result(self):
+        flight = SingleFlight()
+        assert flight.do('key', lambda a, b: a + b, 1, b=2) == 3
+        assert flight.stats() == {'in_flight': 0, 'calls': 1, 'coalesced': 0}
+
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait()
+            return 'result'
+
+        threads, results = self.run_concurrently(flight, fn, 5)
+        wait_for(lambda: flight.stats()['coalesced'] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ['result'] * 5
+        assert len(calls) == 1
+        assert flight.stats() == {'in_flight': 0, 'calls': 1, 'coalesced': 4}
+
+    def test_concurrent_callers_get_the_exception(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def fn():
+            release.wait()
+            raise ValueError('failed')
+
+        threads, results = self.run_concurrently(flight, fn, 3)
+        wait_for(lambda: flight.stats()['coalesced'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+    def test_concurrent_callers_get_base_exceptions(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        class Interrupted(BaseException):
+            pass
+
+        def fn():
+            release.wait()
+            raise Interrupted()
+
+        threads, results = self.run_concurrently(flight, fn, 3)
+        wait_for(lambda: flight.stats()['coalesced'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert all(isinstance(result, Interrupted) for result in results)
+        assert flight.stats()['in_flight'] == 0
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+        flight.do('key', lambda: 1)
+        with pytest.raises(ValueError):
+            flight.do('key', lambda: int('x'))
+
+        assert flight.do('key', lambda: 2) == 2
+        assert flight.stats() == {'in_flight': 0, 'calls': 3, 'coalesced': 0}
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import mock
+from flask import Flask
+from flask_login import LoginManager
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+
+from dmutils.asset_fingerprint import AssetFingerprinter
+from dmutils.flask_init import init_frontend_app
+from dmutils.static_assets import StaticAssetMiddleware
+
+from .helpers import BaseApplicationTest
+
+CSS = b'body { font-family: nta; }'
+CSS_FINGERPRINT = hashlib.md5(CSS).hexdigest()
+
+
+class TestStaticAssetMiddleware(object):
+    def setup(self):
+        self.directory = tempfile.mkdtemp() + '/'
+        os.makedirs(self.directory + 'stylesheets')
+        with open(self.directory + 'stylesheets/application.css', 'wb') as f:
+            f.write(CSS)
+
+        self.flask = Flask('test_app', static_folder=None)
+        self.flask.add_url_rule('/<path:path>', 'app', lambda path: 'from the app', methods=['GET', 'POST'])
+        self.fingerprinter = AssetFingerprinter(filesystem_path=self.directory)
+        self.flask.wsgi_app = StaticAssetMiddleware(self.flask.wsgi_app, '/static', self.fingerprinter, 60)
+        self.client = Client(self.flask, BaseResponse)
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fingerprinted_url_is_immutable(self):
+        url = self.fingerprinter.get_url('stylesheets/application.css')
+        response = self.client.get(url)
+
+        assert response.status_code == 200
+        assert response.data == CSS
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert response.headers['ETag'] == '"{}"'.format(CSS_FINGERPRINT)
+        assert response.headers['Content-Type'].startswith('text/css')
+        assert response.headers['Content-Length'] == str(len(CSS))
+
+    def test_url_without_current_fingerprint(self):
+        for url in ['/static/stylesheets/application.css', '/static/stylesheets/application.css?old']:
+            response = self.client.get(url)
+
+            assert response.status_code == 200
+            assert response.data == CSS
+            assert response.headers['Cache-Control'] == 'public, max-age=60'
+
+    def test_not_modified(self):
+        for if_none_match in ['"{}"'.format(CSS_FINGERPRINT), 'W/"other", "{}"'.format(CSS_FINGERPRINT), '*']:
+            response = self.client.get(
+                '/static/stylesheets/application.css', headers={'If-None-Match': if_none_match}
+            )
+
+            assert response.status_code == 304
+            assert response.data == b''
+            assert response.headers['ETag'] == '"{}"'.format(CSS_FINGERPRINT)
+
+    def test_modified(self):
+        response = self.client.get('/static/stylesheets/application.css', headers={'If-None-Match': '"other"'})
+
+        assert response.status_code == 200
+        assert response.data == CSS
+
+    def test_head(self):
+        response = self.client.head('/static/stylesheets/application.css')
+
+        assert response.status_code == 200
+        assert response.data == b''
+        assert response.headers['Content-Length'] == str(len(CSS))
+
+    def test_compressed_files_are_served_as_they_are(self):
+        with open(self.directory + 'archive.tar.gz', 'wb') as f:
+            f.write(b'gzipped')
+
+        response = self.client.get('/static/archive.tar.gz')
+
+        assert response.data == b'gzipped'
+        assert 'Content-Encoding' not in response.headers
+
+    def test_uses_file_wrapper(self):
+        file_wrapper = mock.Mock(return_value=[CSS])
+        response = self.client.get(
+            '/static/stylesheets/application.css', environ_overrides={'wsgi.file_wrapper': file_wrapper}
+        )
+
+        assert response.data == CSS
+        assert file_wrapper.call_args[0][0].name == self.directory + 'stylesheets/application.css'
+
+    def test_other_requests_go_to_the_app(self):
+        assert self.client.get('/static/missing.css').data == b'from the app'
+        assert self.client.get('/static/stylesheets').data == b'from the app'
+        assert self.client.get('/static/../static/stylesheets/application.css').data == b'from the app'
+        assert self.client.get('/other/stylesheets/application.css').data == b'from the app'
+        assert self.client.post('/static/stylesheets/application.css').data == b'from the app'
+
+
+class TestFrontendAppStaticAssets(BaseApplicationTest):
+    def test_middleware_is_installed(self):
+        assert isinstance(self.flask.wsgi_app, StaticAssetMiddleware)
+        assert self.flask.wsgi_app.fingerprinter is self.flask.extensions['asset_fingerprinter']
+        assert self.flask.wsgi_app.max_age == 60
+
+    def test_max_age_defaults_to_zero(self):
+        application = Flask('test_app', static_url_path='/static')
+        application.config.update({'ASSET_PATH': '/static', 'DM_TIMEZONE': 'Australia/Sydney'})
+        init_frontend_app(application, None, LoginManager(), ['tests/templates'])
+
+        assert application.wsgi_app.max_age == 0
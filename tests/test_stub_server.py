@@ -0,0 +1,66 @@
+import json
+
+import pytest
+import requests
+from monotonic import monotonic
+
+from react.stub_server import StubRenderServer
+
+
+def render(server, path='/widget.js'):
+    return requests.post(server.url, data=json.dumps({'path': path, 'serializedProps': '{}', 'toStaticMarkup': False}))
+
+
+class TestStubRenderServer(object):
+    def test_render(self):
+        with StubRenderServer() as server:
+            res = render(server)
+
+        assert res.status_code == 200
+        assert res.json() == {
+            'markup': '<div data-path="/widget.js"></div>',
+            'slug': 'main',
+            'files': {'main': 'main.js', 'vendor': 'vendor.js'},
+        }
+
+    def test_markup_size(self):
+        with StubRenderServer(markup_size=1000) as server:
+            markup = render(server).json()['markup']
+
+        assert len(markup) == 1000
+        assert markup.startswith('<div data-path="/widget.js">')
+        assert markup.endswith('</div>')
+
+    def test_delay_and_jitter(self):
+        with StubRenderServer(delay=0.02, jitter=0.02, seed=1) as server:
+            start = monotonic()
+            render(server)
+            elapsed = monotonic() - start
+
+        assert 0.02 <= elapsed < 1
+
+    def test_http_errors(self):
+        with StubRenderServer(error_rate=1) as server:
+            res = render(server)
+
+        assert res.status_code == 500
+
+    def test_render_errors(self):
+        with StubRenderServer(error_rate=1, error_kind='render') as server:
+            res = render(server)
+
+        assert res.status_code == 200
+        assert res.json()['error']['message'] == 'Stub render error'
+
+    def test_error_rate_is_repeatable_with_seed(self):
+        def statuses():
+            with StubRenderServer(error_rate=0.5, seed=42) as server:
+                return [render(server).status_code for _ in range(20)]
+
+        first = statuses()
+        assert first == statuses()
+        assert set(first) == {200, 500}
+
+    def test_invalid_error_kind(self):
+        with pytest.raises(ValueError):
+            StubRenderServer(error_kind='timeout')
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+import requests
+
+from react.stub_server import StubRenderServer
+from react.transport import RenderTransport, TransportPool, request_url
+
+
+@pytest.mark.parametrize('url,expected', [
+    ('http://127.0.0.1:63578/render', 'http://127.0.0.1:63578/render'),
+    ('unix:///var/run/render.sock', 'http+unix://%2Fvar%2Frun%2Frender.sock/'),
+    ('unix:///var/run/render.sock:/render', 'http+unix://%2Fvar%2Frun%2Frender.sock/render'),
+])
+def test_request_url(url, expected):
+    assert request_url(url) == expected
+
+
+def test_transport_pool_reuses_transports():
+    pool = TransportPool()
+    transport = pool.get(pool_size=5)
+
+    assert pool.get(pool_size=5) is transport
+    assert pool.get(pool_size=6) is not transport
+    pool.close()
+
+
+class TestUnixSocketTransport(object):
+    def setup(self):
+        self.socket_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.socket_dir, 'render.sock')
+        self.transport = RenderTransport(pool_size=2)
+
+    def teardown(self):
+        self.transport.close()
+        shutil.rmtree(self.socket_dir)
+
+    def test_post_over_unix_socket(self):
+        with StubRenderServer(unix_socket=self.socket_path) as server:
+            for path in ('/first.js', '/second.js'):
+                res = self.transport.post(server.url, data='{"path": "%s"}' % path, timeout=(1, 1))
+
+                assert res.status_code == 200
+                assert res.json()['markup'] == '<div data-path="{}"></div>'.format(path)
+
+    def test_connection_error_if_socket_is_missing(self):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            self.transport.post('unix://' + self.socket_path, data='{}', timeout=(1, 1))